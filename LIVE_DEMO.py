@@ -19,23 +19,26 @@ if __name__ == '__main__':
     '''
     links = [50, 50]
     scr = Scara(links)
+    cache = Cache()  # reruns with the same drawing reuse the rendered GIF
 
     '''
-    Prompts the user to draw a path on the GUI, and returns the path.
-    The path is returned as a function of time.
+    Prompts the user to draw one or more strokes on the GUI, and returns them as arrays of points.
     The size of the GUI, it is set to the diagonal of the arm so the whole drawing can be calculated
+    The arm is drawn on the GUI and follows the cursor live while drawing, turning red when the cursor is out of reach.
     '''
     size = (links[0]+links[1])/math.sqrt(2)*2
-    path = draw_path(size)
+    strokes = draw_strokes(size, scr=scr)
+    if not strokes:
+        print('Not enough points')
+        exit()
 
     '''
-    This path is fed into the path_invk function, which calculates the inverse kinematics for the path.
-    It does this by calculating the inverse kinematics for each point in the path, and then interpolating the angles between the points.
-    This returns a function for each linkage angle which will be modulated to follow the path.
-
-    This function is the main workhorse of the program, and has many sub-functions that are used to calculate the inverse kinematics and linear interpolations between points.
+    The strokes are fed into the strokes_trajectory function, which calculates the inverse kinematics for every point in one batch.
+    It orders and orients the strokes to minimize how far the joints travel between them, and joins them with joint space moves,
+    so the arm travels between strokes instead of drawing a straight line from one to the next.
+    This returns a function for each linkage angle which will be modulated to follow the strokes.
     '''
-    a1_t, a2_t = path_invk(scr, path, 100)
+    a1_t, a2_t = strokes_trajectory(scr.geometry, strokes).functions()
 
     '''
     This function simulates the path, and displays it in a matplotlib plot.
@@ -51,6 +54,6 @@ if __name__ == '__main__':
     To end the animation, press the [x] button on the plot.
     '''
     animate(
-        Scara(links), a1_t, a2_t, model_int=100, show=True,
+        Scara(links), a1_t, a2_t, model_int=100, show=True, cache=cache,
         name='Path IK Animation'
     )
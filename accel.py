@@ -0,0 +1,222 @@
+'''
+Optional compiled scalar kernels for single target IK, FK and trajectory lookup.
+
+The kernels are written in the subset of Python that Numba compiles. With the
+'numba' backend they are compiled to native code, with the 'python' backend the
+same source runs in the interpreter. kinematics.inverse_point, kinematics.forward_point
+and Trajectory.at dispatch to them for scalar calls while a compiled backend is active,
+so callers keep using the same API.
+
+The backend is chosen with set_backend() or the IK_BACKEND environment variable
+('python', 'numba' or 'auto', the default 'auto' uses Numba when it is installed).
+'''
+import math
+import os
+
+import numpy as np
+
+import metrics
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+
+def _inverse_kernel(l1, l2, x, y):
+    # returns nan, nan when out of reach
+    c = (x*x + y*y - l1*l1 - l2*l2) / (2*l1*l2)
+    if c < -1.0 or c > 1.0:
+        return math.nan, math.nan
+    a2 = math.acos(c)
+    # atan(y / x) + pi for x < 0, as in kinematics.inverse, without dividing by x
+    base = math.atan2(y, x + 0.0)  # + 0.0 turns -0.0 into 0.0
+    if base < -math.pi / 2:
+        base += 2 * math.pi
+    # the elbow term is pi / 2 where its denominator vanishes, like np.arctan(inf)
+    den = l1 + l2 * math.cos(a2)
+    elbow = math.atan(l2 * math.sin(a2) / den) if den != 0.0 else math.pi / 2
+    return math.degrees(base - elbow), math.degrees(a2)
+
+
+def _forward_kernel(lengths, angles):
+    x = 0.0
+    y = 0.0
+    cum_angle = 0.0
+    for i in range(len(lengths)):
+        cum_angle += math.radians(angles[i])
+        x += lengths[i] * math.cos(cum_angle)
+        y += lengths[i] * math.sin(cum_angle)
+    return x, y
+
+
+def _interp_kernel(ts, values, t):
+    # linear interpolation of increasing knots, clamped like np.interp
+    n = len(ts)
+    if t <= ts[0]:
+        return values[0]
+    if t >= ts[n - 1]:
+        return values[n - 1]
+    lo = 0
+    hi = n - 1
+    while hi - lo > 1:
+        mid = (lo + hi) // 2
+        if ts[mid] <= t:
+            lo = mid
+        else:
+            hi = mid
+    span = ts[hi] - ts[lo]
+    if span == 0:
+        return values[hi]
+    return values[lo] + (values[hi] - values[lo]) * (t - ts[lo]) / span
+
+
+def _inverse_array_kernel(l1, l2, xs, ys, out):
+    for i in range(len(xs)):
+        out[i, 0], out[i, 1] = _inverse_kernel(l1, l2, xs[i], ys[i])
+
+
+_PYTHON = {
+    'inverse': _inverse_kernel,
+    'forward': _forward_kernel,
+    'interp': _interp_kernel,
+    'inverse_array': _inverse_array_kernel,
+}
+_compiled = None
+_kernels = _PYTHON
+backend = 'python'
+
+
+def _compile() -> dict:
+    global _compiled
+    if _compiled is None:
+        jit = numba.njit(cache=True, error_model='numpy')
+        inverse = jit(_inverse_kernel)
+
+        # the array kernel calls the compiled scalar kernel
+        def inverse_array(l1, l2, xs, ys, out):
+            for i in range(len(xs)):
+                out[i, 0], out[i, 1] = inverse(l1, l2, xs[i], ys[i])
+
+        _compiled = {
+            'inverse': inverse,
+            'forward': jit(_forward_kernel),
+            'interp': jit(_interp_kernel),
+            'inverse_array': jit(inverse_array),
+        }
+    return _compiled
+
+
+def set_backend(name: str) -> str:
+    '''
+    Selects the kernel backend
+
+    Parameters:
+        name (str): 'numba', 'python', or 'auto' for Numba when it is installed
+
+    Returns:
+        str: the backend now in use
+    '''
+    global _kernels, backend
+    if name == 'auto':
+        name = 'numba' if numba is not None else 'python'
+    if name == 'numba':
+        if numba is None:
+            raise Exception('The numba backend needs numba to be installed')
+        _kernels = _compile()
+    elif name == 'python':
+        _kernels = _PYTHON
+    else:
+        raise Exception(f'Unknown backend {name!r}, use "numba", "python" or "auto"')
+    backend = name
+    return backend
+
+
+def compiled() -> bool:
+    '''
+    Returns whether a compiled backend is active, in which case the scalar API dispatches here
+    '''
+    return backend != 'python'
+
+
+def inverse_point(geom, target: tuple) -> tuple:
+    '''
+    Same as kinematics.inverse_point, using the active kernels
+    '''
+    if geom.two_l1_l2 is None:
+        raise Exception('Inverse kinematics only works for 2 linkages')
+    l1, l2 = geom.lengths
+    a1, a2 = _kernels['inverse'](l1, l2, float(target[0]), float(target[1]))
+    if a2 != a2:  # nan
+        metrics.count('kinematics.unreachable')
+        raise Exception('Position is out of reach')
+    return (a1, a2)
+
+
+def forward_point(geom, angles: tuple) -> tuple:
+    '''
+    Same as kinematics.forward_point, using the active kernels
+    '''
+    return _kernels['forward'](geom.lengths_array, np.asarray(angles, dtype=np.float64))
+
+
+def interp(ts: np.ndarray, values: np.ndarray, t: float) -> float:
+    '''
+    Same as np.interp for a scalar t, using the active kernels
+    '''
+    # np.asarray drops ndarray subclasses such as np.memmap without copying, the kernel takes any strides
+    return _kernels['interp'](np.asarray(ts), np.asarray(values), float(t))
+
+
+def inverse_array(geom, x, y) -> tuple:
+    '''
+    Solves many targets with the active scalar kernel in one native loop, nan where out of reach
+
+    Returns:
+        tuple: arrays of angles in degrees (a1, a2)
+    '''
+    l1, l2 = geom.lengths
+    x = np.ascontiguousarray(x, dtype=np.float64).ravel()
+    y = np.ascontiguousarray(y, dtype=np.float64).ravel()
+    out = np.empty((len(x), 2))
+    _kernels['inverse_array'](l1, l2, x, y, out)
+    return out[:, 0], out[:, 1]
+
+
+def verify(samples: int = 1000, seed: int = 0) -> float:
+    '''
+    Checks the active kernels against the numpy implementation on random targets and configurations
+
+    Returns:
+        float: the largest absolute difference found, raises if it is above 1e-9
+    '''
+    import kinematics  # imported here as kinematics dispatches to this module
+
+    rng = np.random.default_rng(seed)
+    geom = kinematics.ArmGeometry((50.0, 40.0))
+    x = rng.uniform(-95, 95, samples)
+    y = rng.uniform(-95, 95, samples)
+
+    expected = np.stack(kinematics.inverse(geom, x, y, strict=False), axis=-1)
+    got = np.stack(inverse_array(geom, x, y), axis=-1)
+    if not np.array_equal(np.isnan(expected), np.isnan(got)):
+        raise Exception('Kernels disagree on which targets are reachable')
+    error = float(np.nanmax(np.abs(expected - got), initial=0))
+
+    angles = rng.uniform(-180, 180, (samples, 2))
+    fx, fy = kinematics.forward(geom, angles)
+    for i in range(samples):
+        px, py = forward_point(geom, angles[i])
+        error = max(error, abs(px - fx[i]), abs(py - fy[i]))
+
+    ts = np.sort(rng.uniform(0, 1, 50))
+    values = rng.normal(size=50)
+    for t in rng.uniform(-.1, 1.1, samples):
+        error = max(error, abs(interp(ts, values, t) - np.interp(t, ts, values)))
+
+    if error > 1e-9:
+        raise Exception(f'Kernels differ from numpy by {error}')
+    return error
+
+
+set_backend(os.environ.get('IK_BACKEND', 'auto'))
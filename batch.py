@@ -0,0 +1,229 @@
+'''
+Batch runner for solving and validating many trajectories across a process pool.
+
+Jobs are sent to the workers in chunks and results are yielded as each chunk
+completes, so very large queues can be processed without holding them all in memory.
+Paths must be picklable: either a module level function of t or an array of points.
+'''
+import hashlib
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from itertools import islice
+from typing import NamedTuple
+
+import numpy as np
+
+import kinematics
+import paths
+import trajectory
+from cache import Cache
+from cache import key as cache_key
+
+
+class BatchJob(NamedTuple):
+    job_id: object
+    lengths: tuple  # link lengths of the arm
+    path: object  # function of t in [0, 1] returning (x, y), or an (n, 2) array of points
+    intervals: int = 100
+
+
+class BatchResult(NamedTuple):
+    job_id: object
+    ok: bool
+    error: str  # None if the job succeeded
+    a1s: np.ndarray  # solved knots, None on failure
+    a2s: np.ndarray
+    max_error: float  # end effector deviation from the path
+    mean_error: float
+    unreachable: int  # number of unreachable knots
+    seconds: float
+    export_path: str  # None unless exported
+
+
+def _sample_path(path, ts: np.ndarray) -> tuple:
+    '''
+    Returns the x and y arrays of the path sampled at ts
+    '''
+    if callable(path):
+        return paths.sample_path(path, ts)
+
+    # treat the points as evenly spaced over t, like draw_path
+    points = np.asarray(path, dtype=np.float64)
+    knot_ts = np.linspace(0, 1, len(points))
+    points = np.column_stack((
+        np.interp(ts, knot_ts, points[:, 0]),
+        np.interp(ts, knot_ts, points[:, 1]),
+    ))
+    return points[:, 0], points[:, 1]
+
+
+def export_name(job_id) -> str:
+    '''
+    Returns the file name a job is exported to: the id reduced to safe characters, plus a hash of the id
+    so ids that look alike, such as 1 and '1' or 'a/b' and 'a_b', never share a file
+    '''
+    safe = re.sub(r'[^A-Za-z0-9_.-]', '_', str(job_id)).lstrip('.')[:64]
+    digest = hashlib.sha256(repr(job_id).encode()).hexdigest()[:12]
+    return f'{safe}-{digest}.ikt'
+
+
+_caches = {}
+
+
+def _open_cache(cache_dir: str) -> Cache:
+    # one Cache per directory and process, so its size estimate is kept between jobs
+    if cache_dir not in _caches:
+        _caches[cache_dir] = Cache(cache_dir)
+    return _caches[cache_dir]
+
+
+def solve_job(job: BatchJob, check_int: int = None, export_dir: str = None, cache_dir: str = None) -> BatchResult:
+    '''
+    Solves the inverse kinematics of one job the same way path_invk does and measures its tracking error
+
+    Parameters:
+        job (BatchJob): the job to solve
+        check_int (int): the number of intervals to check the tracking error with (default: 4 * intervals)
+        export_dir (str): directory to save the solved knots to, named by export_name (default: None, no export)
+        cache_dir (str): directory of a Cache to reuse results of jobs with the same geometry and samples (default: None)
+
+    Returns:
+        BatchResult: the result of the job
+    '''
+    start = time.perf_counter()
+    try:
+        geom = kinematics.ArmGeometry(tuple(job.lengths))
+        n = job.intervals
+
+        # samples at the middle of each interval
+        ts = (np.arange(n) + .5) / n
+        x, y = _sample_path(job.path, ts)
+        check_int = check_int or 4 * n
+        check_ts = np.linspace(0, 1, check_int + 1)
+        px, py = _sample_path(job.path, check_ts)
+
+        # the result only depends on the geometry and the path samples
+        cache = key = cached = None
+        if cache_dir is not None:
+            cache = _open_cache(cache_dir)
+            key = cache_key('solve_job', geom.lengths, x, y, px, py)
+            cached = cache.get_arrays(key)
+
+        if cached is not None:
+            a1s, a2s = cached['a1s'], cached['a2s']
+            unreachable = int(cached['unreachable'])
+            max_error, mean_error = cached['errors'].tolist()
+        else:
+            a1s, a2s = kinematics.inverse(geom, x, y, strict=False)
+            unreachable = int(np.count_nonzero(np.isnan(a2s)))
+            max_error = mean_error = np.nan
+            if not unreachable:
+                # the knots are interpolated evenly over t, like _multi_lerp
+                knot_ts = np.linspace(0, 1, n)
+                angles = np.column_stack((
+                    np.interp(check_ts, knot_ts, a1s),
+                    np.interp(check_ts, knot_ts, a2s),
+                ))
+                fx, fy = kinematics.forward(geom, angles)
+                errors = np.hypot(fx - px, fy - py)
+                max_error, mean_error = float(errors.max()), float(errors.mean())
+            if cache is not None:
+                cache.put_arrays(key, a1s=a1s, a2s=a2s, unreachable=unreachable, errors=(max_error, mean_error))
+
+        if unreachable:
+            return BatchResult(
+                job.job_id, False, f'{unreachable}/{n} targets are out of reach',
+                None, None, None, None, unreachable, time.perf_counter() - start, None
+            )
+
+        export_path = None
+        if export_dir is not None:
+            export_path = os.path.join(export_dir, export_name(job.job_id))
+            trajectory.save(export_path, trajectory.Trajectory(
+                np.linspace(0, 1, n), np.column_stack((a1s, a2s)), geom.lengths,
+                metadata={'job_id': str(job.job_id), 'intervals': n}
+            ))
+
+        return BatchResult(
+            job.job_id, True, None, a1s, a2s, max_error, mean_error, 0,
+            time.perf_counter() - start, export_path
+        )
+    except Exception as e:
+        return BatchResult(
+            job.job_id, False, str(e), None, None, None, None, 0,
+            time.perf_counter() - start, None
+        )
+
+
+def _solve_chunk(jobs: list, check_int: int, export_dir: str, cache_dir: str = None) -> list:
+    return [solve_job(job, check_int, export_dir, cache_dir) for job in jobs]
+
+
+def _chunks(iterable, size: int):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def run_batch(jobs, workers: int = None, chunksize: int = 64, check_int: int = None, export_dir: str = None, max_pending: int = None, cache_dir: str = None):
+    '''
+    Solves many jobs across a process pool, yielding results as they complete
+
+    Parameters:
+        jobs (iterable): the BatchJobs to solve, may be a generator
+        workers (int): the number of worker processes (default: os.cpu_count())
+        chunksize (int): the number of jobs sent to a worker at a time (default: 64)
+        check_int (int): the number of intervals to check the tracking error with (default: 4 * intervals)
+        export_dir (str): directory to save the solved knots to, named by export_name (default: None, no export)
+        max_pending (int): the maximum number of chunks in flight (default: 4 * workers)
+        cache_dir (str): directory of a Cache shared by the workers, see solve_job (default: None)
+
+    Returns:
+        generator: BatchResults in completion order
+    '''
+    workers = workers or os.cpu_count() or 1
+    max_pending = max_pending or 4 * workers
+    if export_dir is not None:
+        os.makedirs(export_dir, exist_ok=True)
+
+    chunks = _chunks(jobs, chunksize)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = set()
+        for chunk in chunks:
+            pending.add(pool.submit(_solve_chunk, chunk, check_int, export_dir, cache_dir))
+            # bound the number of chunks in flight so huge queues stream
+            if len(pending) >= max_pending:
+                done = next(as_completed(pending))
+                pending.remove(done)
+                yield from done.result()
+        for done in as_completed(pending):
+            yield from done.result()
+
+
+def summarize(results) -> dict:
+    '''
+    Collects statistics over an iterable of BatchResults
+
+    Returns:
+        dict: job counts, failures by job id, and timing and error statistics
+    '''
+    seconds = []
+    max_errors = []
+    failures = {}
+    for result in results:
+        seconds.append(result.seconds)
+        if result.ok:
+            max_errors.append(result.max_error)
+        else:
+            failures[result.job_id] = result.error
+
+    return {
+        'jobs': len(seconds),
+        'failed': len(failures),
+        'failures': failures,
+        'total_seconds': float(np.sum(seconds)) if seconds else 0.0,
+        'max_job_seconds': float(np.max(seconds)) if seconds else None,
+        'worst_error': float(np.max(max_errors)) if max_errors else None,
+    }
@@ -0,0 +1,162 @@
+'''
+Elbow branch selection over whole trajectories.
+
+Every reachable target has two IK solutions, mirrored about the line from the base
+to the target. The arm can only change between them where they coincide, at full
+extension (a2 = 0) or folded back (|a2| = 180), so the branch of each knot is chosen
+by a Viterbi dynamic program that minimizes the joint travel of the whole trajectory.
+'''
+import numpy as np
+
+import kinematics
+import paths
+from trajectory import Trajectory
+
+BRANCHES = (1, -1)
+
+
+def _wrap(delta: np.ndarray) -> np.ndarray:
+    # shortest signed angle difference in degrees
+    return (delta + 180) % 360 - 180
+
+
+def _move_cost(a: np.ndarray, b: np.ndarray, cost: str) -> np.ndarray:
+    moves = np.abs(_wrap(b - a))
+    if cost == 'time':
+        return moves.max(axis=-1)  # joints move together at the same speed
+    if cost == 'travel':
+        return moves.sum(axis=-1)
+    raise Exception(f'Unknown cost {cost!r}, use "time" or "travel"')
+
+
+def branch_angles(geom, x, y) -> np.ndarray:
+    '''
+    Solves both IK branches of every target in one batch
+
+    Returns:
+        np.ndarray: angles in degrees with shape (2, n, 2), index 0 is the branch of inverse_point and 1 the mirrored one
+    '''
+    return np.stack([
+        np.stack(kinematics.inverse(geom, x, y, branch=branch), axis=-1)
+        for branch in BRANCHES
+    ])
+
+
+def _is_flip_point(a2, flip_tol: float) -> bool:
+    a2 = abs(_wrap(float(a2)))
+    return a2 < flip_tol or a2 > 180 - flip_tol
+
+
+def optimize_branches(geom, x, y, cost: str = 'time', flip_tol: float = 1.0, start_angles: tuple = None, end_angles: tuple = None, start_branch: int = None, end_branch: int = None) -> tuple:
+    '''
+    Picks the IK branch of every target that minimizes the total joint travel
+
+    Parameters:
+        geom (ArmGeometry): the arm geometry
+        x (array): the target x positions, in order
+        y (array): the target y positions, in order
+        cost (str): 'time' to minimize the largest joint move, 'travel' for the sum of joint moves (default: 'time')
+        flip_tol (float): how close in degrees a2 must be to 0 or 180 to switch branches (default: 1)
+        start_angles (tuple): the joint angles the arm starts at (default: None, start on either branch)
+        end_angles (tuple): the joint angles the arm moves to afterwards (default: None, end on either branch)
+        start_branch (int): the branch at start_angles, the first target stays on it unless
+            either is a flip point (default: None, start on either branch)
+        end_branch (int): the branch at end_angles, the last target must be on it unless
+            either is a flip point (default: None, end on either branch)
+
+    Returns:
+        tuple: (branches, angles, total cost), branches is an array of 1 or -1 per target and
+        angles an (n, 2) array unwrapped to be continuous
+    '''
+    both = branch_angles(geom, x, y)
+    n = both.shape[1]
+    if n == 0:
+        return np.empty(0, dtype=int), np.empty((0, 2)), 0.0
+
+    # the branches coincide where the elbow is straight or folded back
+    a2 = np.abs(both[0, :, 1])
+    can_flip = ((a2 < flip_tol) | (a2 > 180 - flip_tol)).tolist()
+
+    # move costs between consecutive knots for the 4 branch pairs, shape (n - 1,)
+    stay = [_move_cost(both[b, :-1], both[b, 1:], cost).tolist() for b in range(2)]
+    switch = [_move_cost(both[b, :-1], both[1 - b, 1:], cost).tolist() for b in range(2)]
+
+    if start_angles is None:
+        best = [0.0, 0.0]
+    else:
+        best = _move_cost(np.asarray(start_angles, dtype=np.float64), both[:, 0], cost).tolist()
+    if start_branch is not None:
+        if start_angles is None:
+            raise Exception('start_branch needs start_angles')
+        if not (can_flip[0] or _is_flip_point(start_angles[1], flip_tol)):
+            best[1 - BRANCHES.index(start_branch)] = np.inf
+    back = []
+
+    # Viterbi over the 2 branch states, a switch into knot i + 1 needs a flip point at i or i + 1
+    for i in range(n - 1):
+        flip = can_flip[i] or can_flip[i + 1]
+        new = []
+        choice = []
+        for b in range(2):
+            from_same = best[b] + stay[b][i]
+            from_other = best[1 - b] + switch[1 - b][i] if flip else np.inf
+            if from_same <= from_other:
+                new.append(from_same)
+                choice.append(b)
+            else:
+                new.append(from_other)
+                choice.append(1 - b)
+        best = new
+        back.append(choice)
+
+    if end_angles is not None:
+        end = _move_cost(both[:, -1], np.asarray(end_angles, dtype=np.float64), cost).tolist()
+        best = [best[0] + end[0], best[1] + end[1]]
+    if end_branch is not None:
+        if end_angles is None:
+            raise Exception('end_branch needs end_angles')
+        if not (can_flip[-1] or _is_flip_point(end_angles[1], flip_tol)):
+            constrained = list(best)
+            constrained[1 - BRANCHES.index(end_branch)] = np.inf
+            # with no flip point between differing start and end branches, keep the cheapest end
+            if min(constrained) < np.inf:
+                best = constrained
+
+    # trace the cheapest sequence back
+    state = 0 if best[0] <= best[1] else 1
+    total = best[state]
+    states = [state]
+    for choice in reversed(back):
+        state = choice[state]
+        states.append(state)
+    states = np.array(states[::-1])
+
+    angles = both[states, np.arange(n)]
+    angles = np.degrees(np.unwrap(np.radians(angles), axis=0))
+    return np.array(BRANCHES)[states], angles, float(total)
+
+
+def optimize_trajectory(geom, path, intervals: int, cost: str = 'time', flip_tol: float = 1.0) -> Trajectory:
+    '''
+    Samples the path like path_invk and solves it with the branch sequence of least joint travel
+
+    Parameters:
+        geom (ArmGeometry): the arm geometry
+        path (function): a parametric function of t in [0, 1] returning the target position
+        intervals (int): the number of intervals to approximate the inverse kinematics with
+        cost (str): 'time' or 'travel', see optimize_branches (default: 'time')
+        flip_tol (float): how close in degrees a2 must be to 0 or 180 to switch branches (default: 1)
+
+    Returns:
+        Trajectory: the trajectory, metadata['branch_switches'] holds the knots where the branch changes
+    '''
+    ts = (np.arange(intervals) + .5) / intervals  # samples at the middle of each interval
+    x, y = paths.sample_path(path, ts)
+    branches, angles, total = optimize_branches(geom, x, y, cost=cost, flip_tol=flip_tol)
+    switches = (np.nonzero(np.diff(branches))[0] + 1).tolist()
+
+    # _multi_lerp spreads the knots evenly over [0, 1]
+    return Trajectory(np.linspace(0, 1, len(angles)), angles, geom.lengths, metadata={
+        'source': 'optimize_trajectory', 'intervals': intervals,
+        'cost': cost, 'total_cost': total, 'branch_switches': switches,
+    })
@@ -0,0 +1,229 @@
+'''
+Content addressed on-disk cache for solved knots and rendered media.
+
+Entries are named by a SHA-256 of everything they depend on, the arm geometry,
+the sampled path or angles and the solver or render parameters, so a changed input
+is a different key and entries never need invalidating. Files are written to a
+temporary name and renamed into place, so concurrent processes only ever see whole
+entries. The last use of an entry is its modification time, and the least recently
+used entries are deleted when the cache grows past its size limit.
+A cache that cannot be written, e.g. a read only shared one, only loses the entry.
+
+The default directory is the IK_CACHE_DIR environment variable, or ~/.cache/2d-invk.
+'''
+import hashlib
+import os
+import struct
+import tempfile
+
+import numpy as np
+
+import metrics
+
+
+def _update(h, part):
+    # feeds a value into the hash with its type and size, so different values never run together
+    if part is None:
+        h.update(b'N')
+    elif isinstance(part, (bool, np.bool_)):
+        h.update(b'B1' if part else b'B0')
+    elif isinstance(part, (int, np.integer)):
+        h.update(b'I' + str(int(part)).encode() + b';')
+    elif isinstance(part, (float, np.floating)):
+        h.update(b'F' + struct.pack('<d', float(part)))
+    elif isinstance(part, str):
+        data = part.encode()
+        h.update(b'S' + struct.pack('<Q', len(data)) + data)
+    elif isinstance(part, bytes):
+        h.update(b'Y' + struct.pack('<Q', len(part)) + part)
+    elif isinstance(part, np.ndarray):
+        data = np.ascontiguousarray(part)
+        h.update(b'A' + data.dtype.str.encode() + struct.pack(f'<{data.ndim + 1}Q', data.ndim, *data.shape))
+        h.update(data.tobytes())
+    elif isinstance(part, (tuple, list)):
+        h.update(b'T' + struct.pack('<Q', len(part)))
+        for item in part:
+            _update(h, item)
+    elif isinstance(part, dict):
+        h.update(b'D' + struct.pack('<Q', len(part)))
+        for k in sorted(part):
+            _update(h, k)
+            _update(h, part[k])
+    else:
+        raise TypeError(f'Cannot hash {type(part).__name__} for a cache key, pass its data instead')
+
+
+def key(*parts) -> str:
+    '''
+    Returns the hex SHA-256 of the parts, which may be None, numbers, strings, bytes,
+    numpy arrays, and tuples, lists and dicts of them
+    '''
+    h = hashlib.sha256()
+    _update(h, parts)
+    return h.hexdigest()
+
+
+class Cache:
+    '''
+    A directory of cache entries with a size limit
+
+    Parameters:
+        directory (str): the cache directory (default: None, IK_CACHE_DIR or ~/.cache/2d-invk)
+        max_bytes (int): the size to evict least recently used entries down to (default: 512 MiB)
+    '''
+
+    def __init__(self, directory: str = None, max_bytes: int = 512 * 2**20):
+        self.directory = directory or os.environ.get('IK_CACHE_DIR') or os.path.join(
+            os.path.expanduser('~'), '.cache', '2d-invk')
+        self.max_bytes = max_bytes
+        self._size = None  # estimate of the total size, scanned on the first write
+        os.makedirs(self.directory, exist_ok=True)
+
+    def path(self, key: str, ext: str) -> str:
+        '''
+        Returns the file name of an entry, whether or not it exists
+        '''
+        return os.path.join(self.directory, key[:2], f'{key}.{ext}')
+
+    def get(self, key: str, ext: str) -> str:
+        '''
+        Returns the file name of an entry and marks it as used, or None if it is not cached
+        '''
+        path = self.path(key, ext)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            metrics.count('cache.misses')
+            return None
+        except PermissionError:
+            # a read only shared cache, the entry is still usable but its last use is not recorded
+            if not os.path.exists(path):
+                metrics.count('cache.misses')
+                return None
+        metrics.count('cache.hits')
+        return path
+
+    def put_file(self, key: str, ext: str, write) -> str:
+        '''
+        Adds an entry written by a function, replacing it atomically
+
+        Parameters:
+            key (str): the key of the entry
+            ext (str): the file extension of the entry, e.g. 'npz' or 'gif'
+            write (function): writes the entry to the temporary file name it is given,
+                which has the same extension
+
+        Returns:
+            str: the file name of the entry, or None if the cache could not be written
+        '''
+        path = self.path(key, ext)
+        tmp = None
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp = tempfile.mkstemp(suffix=f'.tmp.{ext}', dir=os.path.dirname(path))
+            os.close(fd)
+            write(tmp)
+            size = os.path.getsize(tmp)
+            os.replace(tmp, path)
+        except BaseException as e:
+            if tmp is not None and os.path.exists(tmp):
+                try:
+                    os.remove(tmp)
+                except OSError:
+                    pass
+            if not isinstance(e, OSError):
+                raise
+            # a read only or full cache only loses the entry, the caller already has its result
+            metrics.count('cache.write_errors')
+            return None
+
+        if self._size is None:
+            self._size = self._scan()[1]
+        else:
+            self._size += size
+        if self._size > self.max_bytes:
+            self.evict()
+        return path
+
+    def put_bytes(self, key: str, ext: str, data: bytes) -> str:
+        '''
+        Adds an entry holding data, replacing it atomically
+        '''
+        def write(tmp):
+            with open(tmp, 'wb') as f:
+                f.write(data)
+        return self.put_file(key, ext, write)
+
+    def get_arrays(self, key: str) -> dict:
+        '''
+        Returns the arrays stored under key, or None if they are not cached
+        '''
+        path = self.get(key, 'npz')
+        if path is None:
+            return None
+        try:
+            with np.load(path) as data:
+                return {name: data[name] for name in data.files}
+        except FileNotFoundError:  # evicted by another process since get
+            return None
+
+    def put_arrays(self, key: str, **arrays) -> str:
+        '''
+        Stores numpy arrays under key
+        '''
+        def write(tmp):
+            with open(tmp, 'wb') as f:
+                np.savez(f, **arrays)
+        return self.put_file(key, 'npz', write)
+
+    def _scan(self) -> tuple:
+        # (entries as (mtime, size, path), total size), skipping files that vanish mid scan
+        entries = []
+        total = 0
+        for sub in os.scandir(self.directory):
+            if not sub.is_dir():
+                continue
+            for entry in os.scandir(sub.path):
+                if '.tmp.' in entry.name:
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+        return entries, total
+
+    def evict(self) -> int:
+        '''
+        Deletes the least recently used entries until the cache is within max_bytes
+
+        Returns:
+            int: the number of bytes freed
+        '''
+        entries, total = self._scan()
+        freed = 0
+        for _, size, path in sorted(entries):
+            if total - freed <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:  # another process evicted it first
+                pass
+            except OSError:  # e.g. a shared cache entry owned by another user
+                metrics.count('cache.write_errors')
+                continue
+            freed += size
+        self._size = total - freed
+        metrics.count('cache.evicted_bytes', freed)
+        return freed
+
+    def clear(self):
+        '''
+        Deletes every entry
+        '''
+        max_bytes, self.max_bytes = self.max_bytes, -1
+        try:
+            self.evict()
+        finally:
+            self.max_bytes = max_bytes
@@ -0,0 +1,124 @@
+'''
+Kinematic calibration from measured end effector positions.
+
+The model is the forward kinematics with the link lengths and a zero offset per
+joint as parameters: the arm moves to forward(lengths, commanded + offsets). The
+parameters are fitted with Levenberg-Marquardt, where the residuals, the analytic
+Jacobian and the normal equations are computed for every sample in one batch.
+'''
+from typing import NamedTuple
+
+import numpy as np
+
+import kinematics
+
+
+class Calibration(NamedTuple):
+    geometry: kinematics.ArmGeometry  # the fitted link lengths
+    offsets: np.ndarray  # the fitted joint zero offsets in degrees
+    rms: float  # root mean square position residual
+    p95: float  # 95th percentile position residual
+    max: float  # largest position residual
+    iterations: int
+    converged: bool
+
+
+def _residuals(lengths: np.ndarray, offsets: np.ndarray, commanded: np.ndarray, measured: np.ndarray) -> tuple:
+    theta = np.radians(np.cumsum(commanded + offsets, axis=-1))
+    cos, sin = np.cos(theta), np.sin(theta)
+    predicted = np.stack(((lengths * cos).sum(-1), (lengths * sin).sum(-1)), axis=-1)
+    return predicted - measured, cos, sin
+
+
+def _jacobian(lengths: np.ndarray, cos: np.ndarray, sin: np.ndarray) -> np.ndarray:
+    # derivatives of (x, y) by the lengths, then by the offsets in degrees, shape (m, 2, 2n)
+    d_lengths = np.stack((cos, sin), axis=-2)
+
+    # an offset of joint i turns every link from i to the end effector
+    dx = np.flip(np.cumsum(np.flip(-lengths * sin, -1), axis=-1), -1)
+    dy = np.flip(np.cumsum(np.flip(lengths * cos, -1), axis=-1), -1)
+    d_offsets = np.radians(np.stack((dx, dy), axis=-2))
+
+    return np.concatenate((d_lengths, d_offsets), axis=-1)
+
+
+def calibrate(commanded, measured, lengths: tuple, offsets: tuple = None, max_iterations: int = 50, tol: float = 1e-10) -> Calibration:
+    '''
+    Fits the link lengths and joint zero offsets of an arm to measurements
+
+    Parameters:
+        commanded (array): the commanded joint angles in degrees, shape (m, n_links)
+        measured (array): the measured end effector positions, shape (m, 2)
+        lengths (tuple): the nominal link lengths to start from
+        offsets (tuple): the joint offsets in degrees to start from (default: None, zeros)
+        max_iterations (int): the maximum number of Levenberg-Marquardt steps (default: 50)
+        tol (float): the relative decrease in squared error to stop at (default: 1e-10)
+
+    Returns:
+        Calibration: the fitted geometry and offsets and the residual statistics
+    '''
+    commanded = np.asarray(commanded, dtype=np.float64)
+    measured = np.asarray(measured, dtype=np.float64)
+    n = len(lengths)
+    if commanded.ndim != 2 or commanded.shape[1] != n:
+        raise Exception('Number of angles must match number of linkages')
+    if measured.shape != (len(commanded), 2):
+        raise Exception('There must be one measured position per commanded configuration')
+    if len(commanded) < n:
+        raise Exception(f'At least {n} samples are needed to calibrate {2 * n} parameters')
+
+    params = np.concatenate((
+        np.asarray(lengths, dtype=np.float64),
+        np.zeros(n) if offsets is None else np.asarray(offsets, dtype=np.float64),
+    ))
+    residuals, cos, sin = _residuals(params[:n], params[n:], commanded, measured)
+    error = float(np.sum(residuals**2))
+    damping = 1e-3
+    converged = False
+
+    iteration = 0
+    for iteration in range(1, max_iterations + 1):
+        # normal equations summed over every sample
+        jac = _jacobian(params[:n], cos, sin)
+        jtj = np.einsum('mki,mkj->ij', jac, jac)
+        jtr = np.einsum('mki,mk->i', jac, residuals)
+
+        while True:
+            step = np.linalg.solve(jtj + damping * np.diag(np.diag(jtj) + 1e-12), -jtr)
+            candidate = params + step
+            new_residuals, new_cos, new_sin = _residuals(candidate[:n], candidate[n:], commanded, measured)
+            new_error = float(np.sum(new_residuals**2))
+            if new_error <= error:
+                damping = max(damping / 10, 1e-12)
+                break
+            damping *= 10
+            if damping > 1e12:
+                break
+
+        if new_error > error:
+            converged = True  # no step improves the fit
+            break
+
+        improvement = error - new_error
+        params, residuals, cos, sin, error = candidate, new_residuals, new_cos, new_sin, new_error
+        if improvement <= tol * max(error, 1e-300):
+            converged = True
+            break
+
+    distances = np.hypot(residuals[:, 0], residuals[:, 1])
+    return Calibration(
+        kinematics.ArmGeometry(tuple(params[:n].tolist())),
+        params[n:],
+        float(np.sqrt(np.mean(distances**2))),
+        float(np.percentile(distances, 95)),
+        float(distances.max()),
+        iteration,
+        converged,
+    )
+
+
+def commanded_angles(calibration: Calibration, angles) -> np.ndarray:
+    '''
+    Converts joint angles solved with the calibrated geometry into the angles to command the arm with
+    '''
+    return np.asarray(angles, dtype=np.float64) - calibration.offsets
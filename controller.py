@@ -0,0 +1,163 @@
+'''
+Fixed-rate joint setpoint streaming.
+
+run() interpolates a trajectory on the fly and sends one setpoint per tick to a
+transport, reporting loop jitter, overruns and dropped setpoints. Transports only
+need an async send(seq, t, angles) and close(); two stand-ins are provided, an
+in-process fake serial device and a local UDP socket.
+'''
+import asyncio
+import socket
+import struct
+import time
+
+import numpy as np
+
+import metrics
+
+
+class FakeSerialDevice:
+    '''
+    In-process stand-in for a serial motor controller that records every setpoint it receives
+
+    Parameters:
+        latency (float): simulated write time in seconds (default: 0)
+        keep (bool): keep the received setpoints in self.received (default: True)
+    '''
+
+    def __init__(self, latency: float = 0, keep: bool = True):
+        self.latency = latency
+        self.keep = keep
+        self.received = []
+        self.count = 0
+
+    async def send(self, seq: int, t: float, angles: tuple):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        self.count += 1
+        if self.keep:
+            self.received.append((seq, t, tuple(angles)))
+
+    def close(self):
+        pass
+
+
+class UDPTransport:
+    '''
+    Sends each setpoint as one datagram: uint32 sequence number, float64 t, float64 angles
+
+    Parameters:
+        host (str): the receiver address (default: '127.0.0.1')
+        port (int): the receiver port (default: 9870)
+    '''
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 9870):
+        self.address = (host, port)
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setblocking(False)
+
+    async def send(self, seq: int, t: float, angles: tuple):
+        packet = struct.pack(f'<Id{len(angles)}d', seq & 0xFFFFFFFF, t, *angles)
+        try:
+            self.sock.sendto(packet, self.address)
+        except BlockingIOError:
+            metrics.count('controller.udp.dropped')
+
+    def close(self):
+        self.sock.close()
+
+
+def _setpoint_source(traj):
+    # a Trajectory, or a tuple of joint functions of t like simulate takes
+    if hasattr(traj, 'at'):
+        return lambda t: traj.at(t).tolist()
+    return lambda t: [f(t) for f in traj]
+
+
+class ControllerStats:
+    '''
+    Timing statistics of one controller run, jitter is the lateness of each tick in seconds
+    '''
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.sent = 0
+        self.overruns = 0  # ticks that started more than one period late
+        self.dropped = 0  # setpoints skipped to catch up after an overrun
+        self.jitter = []
+        self.duration = 0.0
+
+    def summary(self) -> dict:
+        jitter = np.array(self.jitter) if self.jitter else np.zeros(1)
+        return {
+            'rate': self.rate,
+            'sent': self.sent,
+            'overruns': self.overruns,
+            'dropped': self.dropped,
+            'duration': self.duration,
+            'jitter_mean': float(jitter.mean()),
+            'jitter_p99': float(np.percentile(jitter, 99)),
+            'jitter_max': float(jitter.max()),
+        }
+
+
+async def run(traj, transport, duration: float, rate: float = 1000, spin: float = 0.0005) -> ControllerStats:
+    '''
+    Streams setpoints of a trajectory to a transport at a fixed rate
+
+    Parameters:
+        traj (Trajectory or tuple): the trajectory, or a tuple of joint functions of t in [0, 1]
+        transport: object with an async send(seq, t, angles) method
+        duration (float): the time in seconds to play the trajectory over
+        rate (float): the setpoint rate in Hz (default: 1000)
+        spin (float): the time before each deadline to stop sleeping and yield instead, for precision (default: 0.0005)
+
+    Returns:
+        ControllerStats: the timing statistics of the run
+    '''
+    setpoint = _setpoint_source(traj)
+    period = 1 / rate
+    ticks = int(round(duration * rate))
+    stats = ControllerStats(rate)
+
+    start = time.perf_counter()
+    tick = 0
+    while tick <= ticks:
+        deadline = start + tick * period
+
+        # sleep coarsely, then yield to the loop until the deadline
+        remaining = deadline - time.perf_counter()
+        if remaining > spin:
+            await asyncio.sleep(remaining - spin)
+        while time.perf_counter() < deadline:
+            await asyncio.sleep(0)
+
+        late = time.perf_counter() - deadline
+        stats.jitter.append(late)
+        if late > period:
+            # skip the setpoints we are too late for and send the current one
+            stats.overruns += 1
+            missed = min(int(late / period), ticks - tick)
+            stats.dropped += missed
+            tick += missed
+
+        t = tick / ticks if ticks else 1.0
+        await transport.send(tick, t, setpoint(t))
+        stats.sent += 1
+        tick += 1
+
+    stats.duration = time.perf_counter() - start
+    metrics.count('controller.sent', stats.sent)
+    metrics.count('controller.overruns', stats.overruns)
+    metrics.count('controller.dropped', stats.dropped)
+    return stats
+
+
+def stream(traj, transport, duration: float, rate: float = 1000) -> dict:
+    '''
+    Blocking wrapper around run that closes the transport and returns the stats summary
+    '''
+    try:
+        return asyncio.run(run(traj, transport, duration, rate)).summary()
+    finally:
+        transport.close()
@@ -0,0 +1,145 @@
+'''
+Link length design sweeps.
+
+Evaluates candidate (l1, l2) geometries against a task set of target points and
+paths: how much of the task is reachable, how close it comes to singularities and
+roughly how long it takes at a joint speed limit. Each geometry is evaluated with
+vectorized IK over all task points at once, and geometries are spread over a process pool.
+'''
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import NamedTuple
+
+import numpy as np
+
+import kinematics
+import paths
+
+
+class DesignResult(NamedTuple):
+    lengths: tuple
+    coverage: float  # fraction of task points that are reachable
+    paths_reachable: int  # number of task paths reachable along their whole length
+    min_manipulability: float  # worst normalized manipulability over reachable points, 1 is the best possible
+    cycle_time: float  # estimated seconds to run every reachable path, inf if the task has paths and none are
+
+
+def task_points(points=None, task_paths=(), intervals: int = 100) -> tuple:
+    '''
+    Samples the task set into flat arrays so every geometry can be evaluated in one IK call
+
+    Parameters:
+        points (array): individual target points, shape (n, 2) (default: None)
+        task_paths (iterable): paths of t in [0, 1], each sampled at intervals + 1 points (default: ())
+        intervals (int): the number of intervals to sample each path with (default: 100)
+
+    Returns:
+        tuple: (x, y, path_index), path_index is -1 for individual points
+    '''
+    xs = []
+    ys = []
+    index = []
+    if points is not None and len(points):
+        points = np.asarray(points, dtype=np.float64)
+        xs.append(points[:, 0])
+        ys.append(points[:, 1])
+        index.append(np.full(len(points), -1))
+
+    ts = np.linspace(0, 1, intervals + 1)
+    for i, path in enumerate(task_paths):
+        x, y = paths.sample_path(path, ts)
+        xs.append(x)
+        ys.append(y)
+        index.append(np.full(len(ts), i))
+
+    if not xs:
+        raise Exception('The task set is empty')
+    return np.concatenate(xs), np.concatenate(ys), np.concatenate(index)
+
+
+def evaluate(lengths: tuple, x: np.ndarray, y: np.ndarray, path_index: np.ndarray, max_joint_speed: float = 180) -> DesignResult:
+    '''
+    Evaluates one geometry against a sampled task set from task_points
+
+    Parameters:
+        lengths (tuple): the link lengths (l1, l2)
+        x, y, path_index (array): the sampled task set
+        max_joint_speed (float): the joint speed limit in degrees per second used for the cycle time (default: 180)
+
+    Returns:
+        DesignResult: the scores of the geometry
+    '''
+    geom = kinematics.ArmGeometry(tuple(lengths))
+    a1, a2 = kinematics.inverse(geom, x, y, strict=False)
+    reachable = ~np.isnan(a2)
+
+    coverage = float(np.mean(reachable))
+    if reachable.any():
+        sin_a2 = np.abs(np.sin(np.radians(a2[reachable])))
+        min_manipulability = float(sin_a2.min())  # l1 l2 |sin a2| normalized by l1 l2
+    else:
+        min_manipulability = 0.0
+
+    # time of each path is the sum of its largest joint moves, for the paths the arm can follow
+    steps = np.diff(np.stack((a1, a2), axis=-1), axis=0)
+    moves = np.abs((steps + 180) % 360 - 180).max(axis=-1)
+    same_path = (path_index[1:] == path_index[:-1]) & (path_index[1:] >= 0)
+
+    # slot 0 collects the individual points, which are not part of any path
+    n_paths = int(path_index.max()) + 1
+    path_ok = np.ones(n_paths + 1, dtype=bool)
+    np.logical_and.at(path_ok, path_index + 1, reachable)
+    path_ok[0] = True
+    ok_moves = same_path & path_ok[path_index[1:] + 1]
+    if n_paths and not path_ok[1:].any():
+        cycle_time = float('inf')
+    else:
+        cycle_time = float(np.sum(moves[ok_moves]) / max_joint_speed)
+
+    return DesignResult(geom.lengths, coverage, int(path_ok[1:].sum()), min_manipulability, cycle_time)
+
+
+def _evaluate_chunk(chunk: list, x, y, path_index, max_joint_speed) -> list:
+    return [evaluate(lengths, x, y, path_index, max_joint_speed) for lengths in chunk]
+
+
+def sweep(l1s, l2s, points=None, task_paths=(), intervals: int = 100, max_joint_speed: float = 180, workers: int = None, chunksize: int = 64) -> list:
+    '''
+    Evaluates every (l1, l2) combination against a task set across a process pool
+
+    Parameters:
+        l1s (array): the candidate first link lengths
+        l2s (array): the candidate second link lengths
+        points (array): individual target points, shape (n, 2) (default: None)
+        task_paths (iterable): paths of t in [0, 1], sampled once before the sweep (default: ())
+        intervals (int): the number of intervals to sample each path with (default: 100)
+        max_joint_speed (float): the joint speed limit in degrees per second (default: 180)
+        workers (int): the number of worker processes, 1 runs in this process (default: os.cpu_count())
+        chunksize (int): the number of geometries sent to a worker at a time (default: 64)
+
+    Returns:
+        list: a DesignResult per geometry, in the order of l1s x l2s
+    '''
+    x, y, path_index = task_points(points, task_paths, intervals)
+    geometries = [(float(l1), float(l2)) for l1 in l1s for l2 in l2s]
+    chunks = [geometries[i:i + chunksize] for i in range(0, len(geometries), chunksize)]
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        results = [_evaluate_chunk(chunk, x, y, path_index, max_joint_speed) for chunk in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_evaluate_chunk, chunk, x, y, path_index, max_joint_speed) for chunk in chunks]
+            results = [future.result() for future in futures]
+    return [result for chunk in results for result in chunk]
+
+
+def best(results: list, min_coverage: float = 1.0, min_manipulability: float = 0.0):
+    '''
+    Returns the result with the shortest cycle time that meets the coverage and manipulability requirements, or None
+    '''
+    candidates = [
+        r for r in results
+        if r.coverage >= min_coverage and r.min_manipulability >= min_manipulability
+    ]
+    return min(candidates, key=lambda r: (r.cycle_time, sum(r.lengths)), default=None)
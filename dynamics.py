@@ -0,0 +1,235 @@
+'''
+Batched inverse dynamics of planar serial arms.
+
+Torques are computed with a recursive Newton-Euler pass over the links that is
+vectorized over every sample of a trajectory. Units are SI: link lengths in metres,
+masses in kg and inertias in kg m^2, giving torques in N m and power in W.
+The arm moves in the horizontal plane, so gravity is zero unless given.
+'''
+from dataclasses import dataclass
+from typing import NamedTuple
+
+import numpy as np
+
+
+@dataclass(frozen=True, slots=True)
+class ArmDynamics:
+    '''
+    Mass properties of each link of a planar arm
+
+    Parameters:
+        lengths (tuple): the link lengths in metres
+        masses (tuple): the link masses in kg
+        coms (tuple): the distance of each link's centre of mass from its joint (default: None, the middle of the link)
+        inertias (tuple): each link's moment of inertia about its centre of mass (default: None, a uniform rod)
+        payload (float): a point mass at the end effector in kg (default: 0)
+        gravity (tuple): the gravity vector in the plane of the arm in m/s^2 (default: (0, 0))
+    '''
+    lengths: tuple
+    masses: tuple
+    coms: tuple = None
+    inertias: tuple = None
+    payload: float = 0.0
+    gravity: tuple = (0.0, 0.0)
+
+    def __post_init__(self):
+        n = len(self.lengths)
+        if len(self.masses) != n:
+            raise Exception('Number of masses must match number of linkages')
+
+        set_ = object.__setattr__
+        set_(self, 'lengths', tuple(float(length) for length in self.lengths))
+        set_(self, 'masses', tuple(float(mass) for mass in self.masses))
+        if self.coms is None:
+            set_(self, 'coms', tuple(length / 2 for length in self.lengths))
+        if self.inertias is None:
+            set_(self, 'inertias', tuple(m * l * l / 12 for m, l in zip(self.masses, self.lengths)))
+        if len(self.coms) != n or len(self.inertias) != n:
+            raise Exception('Number of centres of mass and inertias must match number of linkages')
+
+    @classmethod
+    def from_geometry(cls, geom, masses: tuple, scale: float = 0.001, **kwargs):
+        '''
+        Creates the mass properties for an ArmGeometry, scale converts its lengths to metres (default: 0.001, from mm)
+        '''
+        return cls(tuple(length * scale for length in geom.lengths), masses, **kwargs)
+
+
+class TorqueProfile(NamedTuple):
+    times: np.ndarray  # sample times in seconds, shape (n,)
+    torque: np.ndarray  # joint torques in N m, shape (n, n_links)
+    power: np.ndarray  # joint power in W, shape (n, n_links)
+    velocity: np.ndarray  # joint velocities in rad/s, shape (n, n_links)
+    peak_torque: np.ndarray  # peak absolute torque of each joint
+    rms_torque: np.ndarray  # root mean square torque of each joint
+    peak_power: np.ndarray  # peak absolute power of each joint
+
+
+def _cross(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    # z component of the cross product of planar vectors
+    return a[..., 0] * b[..., 1] - a[..., 1] * b[..., 0]
+
+
+def _perp(v: np.ndarray) -> np.ndarray:
+    # z x v, the tangential direction
+    return np.stack((-v[..., 1], v[..., 0]), axis=-1)
+
+
+def inverse_dynamics(dyn: ArmDynamics, q, qd, qdd) -> np.ndarray:
+    '''
+    Returns the joint torques needed for the given joint motion
+
+    Parameters:
+        dyn (ArmDynamics): the mass properties of the arm
+        q (array): relative joint angles in radians, shape (..., n_links)
+        qd (array): joint velocities in rad/s, shape (..., n_links)
+        qdd (array): joint accelerations in rad/s^2, shape (..., n_links)
+
+    Returns:
+        np.ndarray: the joint torques in N m, shape (..., n_links)
+    '''
+    q = np.asarray(q, dtype=np.float64)
+    n = len(dyn.lengths)
+    if q.shape[-1] != n:
+        raise Exception('Number of angles must match number of linkages')
+
+    # absolute link angles, angular velocities and accelerations
+    theta = np.cumsum(q, axis=-1)
+    omega = np.cumsum(np.asarray(qd, dtype=np.float64), axis=-1)
+    alpha = np.cumsum(np.asarray(qdd, dtype=np.float64), axis=-1)
+    direction = np.stack((np.cos(theta), np.sin(theta)), axis=-1)
+    gravity = np.asarray(dyn.gravity, dtype=np.float64)
+
+    # forward pass: acceleration of each joint and centre of mass
+    joint_acc = np.zeros(q.shape[:-1] + (2,))
+    com_vectors = []
+    com_forces = []
+    link_vectors = []
+    for i in range(n):
+        r = dyn.lengths[i] * direction[..., i, :]
+        c = dyn.coms[i] * direction[..., i, :]
+        w = omega[..., i, None]
+        a = alpha[..., i, None]
+        com_acc = joint_acc + a * _perp(c) - w * w * c
+        com_forces.append(dyn.masses[i] * (com_acc - gravity))
+        com_vectors.append(c)
+        link_vectors.append(r)
+        joint_acc = joint_acc + a * _perp(r) - w * w * r
+
+    # backward pass: forces and moments from the end effector to the base
+    force = dyn.payload * (joint_acc - gravity)
+    moment = np.zeros(q.shape[:-1])
+    torque = np.empty(q.shape)
+    for i in reversed(range(n)):
+        moment = (
+            dyn.inertias[i] * alpha[..., i] +
+            _cross(com_vectors[i], com_forces[i]) +
+            _cross(link_vectors[i], force) +
+            moment
+        )
+        force = com_forces[i] + force
+        torque[..., i] = moment
+    return torque
+
+
+def _spline_second_derivatives(ts: np.ndarray, values: np.ndarray) -> np.ndarray:
+    '''
+    Returns the second derivatives at the knots of the natural cubic spline through values,
+    solving the tridiagonal system of every column at once
+    '''
+    n = len(ts)
+    m = np.zeros_like(values)
+    if n < 3:
+        return m
+
+    h = np.diff(ts)
+    slopes = np.diff(values, axis=0) / h[:, None]
+    # rows of the system for the interior knots: h[i-1] m[i-1] + 2 (h[i-1] + h[i]) m[i] + h[i] m[i+1] = rhs[i]
+    diag = 2 * (h[:-1] + h[1:])
+    rhs = 6 * np.diff(slopes, axis=0)
+
+    # Thomas algorithm, forward elimination then back substitution
+    for i in range(1, n - 2):
+        w = h[i] / diag[i - 1]
+        diag[i] -= w * h[i]
+        rhs[i] -= w * rhs[i - 1]
+    interior = np.empty_like(rhs)
+    interior[-1] = rhs[-1] / diag[-1]
+    for i in range(n - 4, -1, -1):
+        interior[i] = (rhs[i] - h[i + 1] * interior[i + 1]) / diag[i]
+    m[1:-1] = interior
+    return m
+
+
+def _spline(ts: np.ndarray, values: np.ndarray, t: np.ndarray) -> tuple:
+    '''
+    Evaluates the natural cubic spline through (ts, values) and its first two derivatives at t
+    '''
+    m = _spline_second_derivatives(ts, values)
+    t = np.clip(t, ts[0], ts[-1])
+    i = np.clip(np.searchsorted(ts, t, side='right') - 1, 0, len(ts) - 2)
+    h = (ts[i + 1] - ts[i])[:, None]
+    a = ((ts[i + 1] - t) / (ts[i + 1] - ts[i]))[:, None]
+    b = 1 - a
+    y0, y1 = values[i], values[i + 1]
+    m0, m1 = m[i], m[i + 1]
+
+    q = a * y0 + b * y1 + ((a**3 - a) * m0 + (b**3 - b) * m1) * h * h / 6
+    qd = (y1 - y0) / h - (3 * a * a - 1) / 6 * h * m0 + (3 * b * b - 1) / 6 * h * m1
+    qdd = a * m0 + b * m1
+    return q, qd, qdd
+
+
+def torque_profile(dyn: ArmDynamics, traj, duration: float, samples: int = None) -> TorqueProfile:
+    '''
+    Samples a trajectory uniformly in time and computes the joint torques and power of every sample in one pass
+
+    The motion between knots is modelled as the natural cubic spline through the knots,
+    differentiated analytically, so velocity and acceleration are continuous and the peaks
+    do not depend on the number of samples. Trajectory.at interpolates linearly instead,
+    whose velocity steps at every knot and whose acceleration is only defined there.
+
+    Parameters:
+        dyn (ArmDynamics): the mass properties of the arm
+        traj (Trajectory): the trajectory, a Trajectory or LazyTrajectory
+        duration (float): the time in seconds the trajectory is played over
+        samples (int): the number of samples (default: None, 4 per knot, or 1000 for a LazyTrajectory)
+
+    Returns:
+        TorqueProfile: the torques, power and peak statistics
+    '''
+    if samples is None:
+        samples = 4 * len(traj) if hasattr(traj, '__len__') else 1000
+    if not hasattr(traj, 'ts'):
+        traj = traj.sample(samples)  # knots of a LazyTrajectory, solved exactly
+
+    # repeated knot times are a single knot
+    ts = np.asarray(traj.ts, dtype=np.float64)
+    unique = np.append(np.diff(ts) > 0, True)
+    if unique.sum() < 2:
+        raise Exception('At least 2 distinct knot times are needed')
+    knot_times = ts[unique] * duration
+    knots = np.unwrap(np.radians(np.asarray(traj.angles, dtype=np.float64)[unique]), axis=0)
+
+    times = np.linspace(0, 1, samples) * duration
+    q, qd, qdd = _spline(knot_times, knots, times)
+    torque = inverse_dynamics(dyn, q, qd, qdd)
+    power = torque * qd
+
+    return TorqueProfile(
+        times, torque, power, qd,
+        np.abs(torque).max(axis=0),
+        np.sqrt(np.mean(torque**2, axis=0)),
+        np.abs(power).max(axis=0),
+    )
+
+
+def required_slowdown(profile: TorqueProfile, torque_limits) -> float:
+    '''
+    Returns the factor the duration must be stretched by to keep every joint within its torque limit
+
+    Without gravity every torque scales with 1 / duration^2 when a trajectory is retimed
+    uniformly, so the factor is sqrt(peak / limit) of the worst joint, and 1 if no joint is overloaded.
+    '''
+    ratio = np.max(profile.peak_torque / np.asarray(torque_limits, dtype=np.float64))
+    return float(max(1.0, np.sqrt(ratio)))
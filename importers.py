@@ -0,0 +1,464 @@
+'''
+Streaming importers for SVG path data and planar G-code.
+
+Every segment is converted to a cubic Bezier and appended to a growable numpy
+table as it is parsed, lines and quadratics exactly and arcs as pieces of at most
+90 degrees. The result is a SegmentPath: a vectorized path function of t that
+path_invk, LazyTrajectory and the simulators can use directly, and that can be
+split into strokes for strokes.strokes_trajectory.
+'''
+import math
+import re
+import xml.etree.ElementTree as ET
+
+import numpy as np
+
+
+class _SegmentBuffer:
+    # growable (n, 4, 2) table of cubic control points with a stroke id per segment
+    def __init__(self, capacity: int = 1024):
+        self.controls = np.empty((capacity, 4, 2))
+        self.stroke_ids = np.empty(capacity, dtype=np.int64)
+        self.n = 0
+        self.stroke = -1
+        self.pen_down = False
+
+    def new_stroke(self):
+        self.pen_down = False
+
+    def append(self, p0, p1, p2, p3):
+        if not self.pen_down:
+            self.stroke += 1
+            self.pen_down = True
+        if self.n == len(self.controls):
+            self.controls = np.concatenate((self.controls, np.empty_like(self.controls)))
+            self.stroke_ids = np.concatenate((self.stroke_ids, np.empty_like(self.stroke_ids)))
+        self.controls[self.n] = (p0, p1, p2, p3)
+        self.stroke_ids[self.n] = self.stroke
+        self.n += 1
+
+    def line(self, p0, p1):
+        p0 = np.asarray(p0, dtype=np.float64)
+        p1 = np.asarray(p1, dtype=np.float64)
+        self.append(p0, p0 + (p1 - p0) / 3, p1 + (p0 - p1) / 3, p1)
+
+    def quad(self, p0, c, p1):
+        p0, c, p1 = (np.asarray(p, dtype=np.float64) for p in (p0, c, p1))
+        self.append(p0, p0 + 2 / 3 * (c - p0), p1 + 2 / 3 * (c - p1), p1)
+
+    def arc(self, center, radius: float, start: float, sweep: float, rotation: float = 0, ratio: float = 1):
+        '''
+        Appends an elliptical arc, angles in radians, ratio is the minor over the major radius
+        '''
+        pieces = max(1, math.ceil(abs(sweep) / (math.pi / 2) - 1e-9))
+        delta = sweep / pieces
+        k = 4 / 3 * math.tan(delta / 4)
+        cos_r, sin_r = math.cos(rotation), math.sin(rotation)
+        cx, cy = center
+
+        def point(a, scale=1.0, tangent=False):
+            # unit circle point or tangent, scaled to the ellipse and rotated
+            u, v = (-math.sin(a), math.cos(a)) if tangent else (math.cos(a), math.sin(a))
+            u *= radius * scale
+            v *= radius * ratio * scale
+            if tangent:
+                return np.array((u * cos_r - v * sin_r, u * sin_r + v * cos_r))
+            return np.array((cx + u * cos_r - v * sin_r, cy + u * sin_r + v * cos_r))
+
+        for i in range(pieces):
+            a0 = start + i * delta
+            a1 = a0 + delta
+            p0 = point(a0)
+            p3 = point(a1)
+            self.append(p0, p0 + point(a0, k, True), p3 - point(a1, k, True), p3)
+
+    def build(self) -> 'SegmentPath':
+        return SegmentPath(self.controls[:self.n].copy(), self.stroke_ids[:self.n].copy())
+
+
+class SegmentPath:
+    '''
+    A path made of cubic Bezier segments, evaluated for arrays of t in one call
+
+    The segments are spread over t in proportion to their approximate length,
+    including the pen up moves between strokes, which are travelled in straight lines.
+
+    Parameters:
+        controls (array): the control points of each segment, shape (n, 4, 2)
+        stroke_ids (array): the stroke each segment belongs to, shape (n,)
+    '''
+    vectorized = True
+
+    def __init__(self, controls, stroke_ids):
+        self.controls = np.asarray(controls, dtype=np.float64)
+        self.stroke_ids = np.asarray(stroke_ids, dtype=np.int64)
+        if len(self.controls) == 0:
+            raise Exception('The path has no segments')
+
+        # approximate lengths, the mean of the chord and the control polygon
+        polygon = np.hypot(*np.diff(self.controls, axis=1).transpose(2, 0, 1)).sum(axis=1)
+        chord = np.hypot(*(self.controls[:, 3] - self.controls[:, 0]).T)
+        lengths = (polygon + chord) / 2
+        # pen up travel into each segment from the end of the previous one
+        travel = np.concatenate(([0.0], np.hypot(*(self.controls[1:, 0] - self.controls[:-1, 3]).T)))
+
+        self.lengths = lengths
+        self.travel = travel
+        total = np.cumsum(np.stack((travel, lengths), axis=-1).ravel())
+        total = np.concatenate(([0.0], total))
+        self.knots = total / total[-1] if total[-1] > 0 else np.linspace(0, 1, len(total))
+
+    def __len__(self):
+        return len(self.controls)
+
+    def __call__(self, t):
+        t = np.asarray(t, dtype=np.float64)
+        flat = np.clip(t.ravel(), 0, 1)
+
+        # each segment owns two knot spans: travel in, then the curve itself
+        span = np.clip(np.searchsorted(self.knots, flat, side='right') - 1, 0, len(self.knots) - 2)
+        width = self.knots[span + 1] - self.knots[span]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            u = np.where(width > 0, (flat - self.knots[span]) / width, 1.0)
+        segment = span // 2
+        travelling = span % 2 == 0
+
+        c = self.controls[segment]
+        # travel runs from the end of the previous segment to the start of this one
+        previous_end = self.controls[np.maximum(segment - 1, 0), 3]
+        travel_point = previous_end + (c[:, 0] - previous_end) * u[:, None]
+
+        w = u[:, None]
+        curve_point = (
+            (1 - w)**3 * c[:, 0] + 3 * (1 - w)**2 * w * c[:, 1] +
+            3 * (1 - w) * w**2 * c[:, 2] + w**3 * c[:, 3]
+        )
+        point = np.where(travelling[:, None], travel_point, curve_point).reshape(t.shape + (2,))
+        return point[..., 0][()], point[..., 1][()]
+
+    def bounds(self) -> tuple:
+        '''
+        Returns the bounding box of the control points (xmin, ymin, xmax, ymax), which contains the path
+        '''
+        points = self.controls.reshape(-1, 2)
+        return (*points.min(axis=0), *points.max(axis=0))
+
+    def transformed(self, scale: float, offset: tuple) -> 'SegmentPath':
+        '''
+        Returns the path scaled about the origin and then moved by offset
+        '''
+        return SegmentPath(self.controls * scale + np.asarray(offset, dtype=np.float64), self.stroke_ids)
+
+    def strokes(self, per_segment: int = 8) -> list:
+        '''
+        Samples each stroke into an (n, 2) array of points, for strokes.strokes_trajectory
+        '''
+        u = np.linspace(0, 1, per_segment + 1)[:, None, None]
+        result = []
+        starts = np.flatnonzero(np.diff(self.stroke_ids, prepend=-1))
+        for start, end in zip(starts, np.append(starts[1:], len(self.controls))):
+            c = self.controls[start:end]
+            points = (
+                (1 - u)**3 * c[:, 0] + 3 * (1 - u)**2 * u * c[:, 1] +
+                3 * (1 - u) * u**2 * c[:, 2] + u**3 * c[:, 3]
+            )  # shape (per_segment + 1, segments, 2)
+            points = points[:-1].transpose(1, 0, 2).reshape(-1, 2)
+            result.append(np.vstack((points, c[-1, 3])))
+        return result
+
+
+def fit_to_workspace(path: SegmentPath, geom, margin: float = 0.05) -> SegmentPath:
+    '''
+    Scales and moves a path to the largest size that fits the reachable annulus of the arm,
+    centred on the y-axis above the inner hole of the workspace
+
+    Parameters:
+        path (SegmentPath): the path to fit
+        geom (ArmGeometry): the arm geometry
+        margin (float): the fraction of the reach to keep clear of the workspace edges (default: 0.05)
+
+    Returns:
+        SegmentPath: the fitted path
+    '''
+    xmin, ymin, xmax, ymax = path.bounds()
+    w, h = xmax - xmin, ymax - ymin
+    clearance = margin * geom.max_reach
+    y0 = geom.min_reach + clearance
+    r = geom.max_reach - clearance
+    if r <= y0:
+        raise Exception('The workspace is too small for the margin')
+
+    # largest s with (s w / 2)^2 + (y0 + s h)^2 <= r^2
+    a = w * w / 4 + h * h
+    if a == 0:
+        scale = 1.0
+    else:
+        b = 2 * y0 * h
+        c = y0 * y0 - r * r
+        scale = (-b + math.sqrt(b * b - 4 * a * c)) / (2 * a)
+
+    offset = (-(xmin + w / 2) * scale, y0 - ymin * scale)
+    return path.transformed(scale, offset)
+
+
+_SVG_COMMAND = re.compile(r'[\s,]*([MmLlHhVvCcSsQqTtAaZz])')
+_SVG_NUMBER = re.compile(r'[\s,]*([-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)')
+# arc flags are single digits and may run into the next number, as in 'a5 5 0 1020 0'
+_SVG_FLAG = re.compile(r'[\s,]*([01])')
+_SVG_SPACE = re.compile(r'[\s,]*')
+_SVG_ARGS = {'M': 2, 'L': 2, 'H': 1, 'V': 1, 'C': 6, 'S': 4, 'Q': 4, 'T': 2, 'A': 7, 'Z': 0}
+
+
+def _svg_arc(buffer: _SegmentBuffer, p0, rx, ry, rotation, large, sweep, p1):
+    # endpoint to centre parameterization, SVG 1.1 appendix F.6.5
+    if np.allclose(p0, p1):
+        return
+    rx, ry = abs(rx), abs(ry)
+    if rx == 0 or ry == 0:
+        buffer.line(p0, p1)
+        return
+    phi = math.radians(rotation)
+    cos_p, sin_p = math.cos(phi), math.sin(phi)
+    dx, dy = (p0[0] - p1[0]) / 2, (p0[1] - p1[1]) / 2
+    x1 = cos_p * dx + sin_p * dy
+    y1 = -sin_p * dx + cos_p * dy
+
+    scale = x1 * x1 / (rx * rx) + y1 * y1 / (ry * ry)
+    if scale > 1:
+        rx *= math.sqrt(scale)
+        ry *= math.sqrt(scale)
+    num = rx * rx * ry * ry - rx * rx * y1 * y1 - ry * ry * x1 * x1
+    den = rx * rx * y1 * y1 + ry * ry * x1 * x1
+    root = math.sqrt(max(0.0, num / den)) * (-1 if large == sweep else 1)
+    cx1 = root * rx * y1 / ry
+    cy1 = -root * ry * x1 / rx
+    cx = cos_p * cx1 - sin_p * cy1 + (p0[0] + p1[0]) / 2
+    cy = sin_p * cx1 + cos_p * cy1 + (p0[1] + p1[1]) / 2
+
+    start = math.atan2((y1 - cy1) / ry, (x1 - cx1) / rx)
+    end = math.atan2((-y1 - cy1) / ry, (-x1 - cx1) / rx)
+    delta = end - start
+    if sweep and delta < 0:
+        delta += 2 * math.pi
+    elif not sweep and delta > 0:
+        delta -= 2 * math.pi
+    buffer.arc((cx, cy), rx, start, delta, rotation=phi, ratio=ry / rx)
+
+
+def _parse_svg_d(d: str, buffer: _SegmentBuffer, flip_y: bool = True):
+    '''
+    Parses one SVG path data string into the buffer, token by token
+    '''
+    sign = -1.0 if flip_y else 1.0  # SVG y points down
+    current = np.zeros(2)
+    start = np.zeros(2)
+    last_control = None
+    last_command = None
+    command = None
+    args = []
+
+    pos = _SVG_SPACE.match(d).end()
+    while pos < len(d):
+        match = _SVG_COMMAND.match(d, pos)
+        if match:
+            pos = match.end()
+            command = match.group(1)
+            args = []
+            if command in 'Zz':
+                if not np.allclose(current, start):
+                    buffer.line(current, start)
+                current = start.copy()
+                buffer.new_stroke()
+                last_command = 'Z'
+            pos = _SVG_SPACE.match(d, pos).end()
+            continue
+        if command is None or command in 'Zz':
+            raise Exception(f'Expected an SVG path command at position {pos}')
+
+        upper = command.upper()
+        match = (_SVG_FLAG if upper == 'A' and len(args) in (3, 4) else _SVG_NUMBER).match(d, pos)
+        if not match:
+            raise Exception(f'Invalid SVG path data at position {pos}')
+        pos = _SVG_SPACE.match(d, match.end()).end()
+        args.append(float(match.group(1)))
+
+        if len(args) < _SVG_ARGS[upper]:
+            continue
+        relative = command.islower()
+        base = current if relative else np.zeros(2)
+
+        def pt(i):
+            return base + (args[i], sign * args[i + 1])
+
+        control = None
+        if upper == 'M':
+            current = pt(0)
+            start = current.copy()
+            buffer.new_stroke()
+            command = 'l' if relative else 'L'  # further pairs are line tos
+        elif upper in 'LHV':
+            if upper == 'L':
+                end = pt(0)
+            elif upper == 'H':
+                end = np.array((base[0] + args[0], current[1]))
+            else:
+                end = np.array((current[0], base[1] + sign * args[0]))
+            buffer.line(current, end)
+            current = end
+        elif upper in 'CS':
+            if upper == 'C':
+                c1, c2, end = pt(0), pt(2), pt(4)
+            else:
+                reflect = last_control is not None and last_command in 'CS'
+                c1 = 2 * current - last_control if reflect else current.copy()
+                c2, end = pt(0), pt(2)
+            buffer.append(current, c1, c2, end)
+            control, current = c2, end
+        elif upper in 'QT':
+            if upper == 'Q':
+                c, end = pt(0), pt(2)
+            else:
+                reflect = last_control is not None and last_command in 'QT'
+                c = 2 * current - last_control if reflect else current.copy()
+                end = pt(0)
+            buffer.quad(current, c, end)
+            control, current = c, end
+        else:
+            end = pt(5)
+            # flipping y mirrors the arc, which reverses its sweep and rotation
+            rotation = sign * args[2]
+            sweep = bool(args[4]) if not flip_y else not bool(args[4])
+            _svg_arc(buffer, current, args[0], args[1], rotation, bool(args[3]), sweep, end)
+            current = end
+
+        last_control = control
+        last_command = upper
+        args = []
+
+
+def load_svg(source, flip_y: bool = True) -> SegmentPath:
+    '''
+    Streams the <path> elements of an SVG file into a SegmentPath
+
+    Parameters:
+        source (str or file): the SVG file name or file object
+        flip_y (bool): flip the y-axis, which points down in SVG (default: True)
+
+    Returns:
+        SegmentPath: every path in document order, each subpath a separate stroke
+    '''
+    buffer = _SegmentBuffer()
+    for _, element in ET.iterparse(source, events=('end',)):
+        if element.tag.rsplit('}', 1)[-1] == 'path' and element.get('d'):
+            _parse_svg_d(element.get('d'), buffer, flip_y)
+            buffer.new_stroke()
+        element.clear()  # keep memory flat on large files
+    return buffer.build()
+
+
+def parse_svg_path(d: str, flip_y: bool = True) -> SegmentPath:
+    '''
+    Parses an SVG path data string such as 'M 0 0 L 10 0 A 5 5 0 0 1 20 0'
+    '''
+    buffer = _SegmentBuffer()
+    _parse_svg_d(d, buffer, flip_y)
+    return buffer.build()
+
+
+_GCODE_WORD = re.compile(r'([A-Za-z])\s*([-+]?(?:\d+\.?\d*|\.\d+))')
+
+
+def load_gcode(source) -> SegmentPath:
+    '''
+    Streams a planar G-code program into a SegmentPath
+
+    Supports G0 (rapid moves, which start a new stroke), G1, G2 and G3 (arcs with I J
+    or R), G17, G20/G21 (inches or millimetres) and G90/G91 (absolute or relative).
+    Z and feed rates are ignored.
+
+    Parameters:
+        source (str or file): the G-code file name or a file object of lines
+
+    Returns:
+        SegmentPath: the cutting moves, each run of moves between rapids a separate stroke
+    '''
+    if isinstance(source, str):
+        with open(source) as f:
+            return load_gcode(f)
+
+    buffer = _SegmentBuffer()
+    current = np.zeros(2)
+    motion = None
+    absolute = True
+    units = 1.0
+
+    for line in source:
+        line = re.sub(r'\(.*?\)', '', line).split(';', 1)[0]
+        words = _GCODE_WORD.findall(line)
+        if not words:
+            continue
+
+        values = {}
+        for letter, value in words:
+            letter = letter.upper()
+            if letter == 'G':
+                code = float(value)
+                if code in (0, 1, 2, 3):
+                    motion = int(code)
+                elif code == 20:
+                    units = 25.4
+                elif code == 21:
+                    units = 1.0
+                elif code == 90:
+                    absolute = True
+                elif code == 91:
+                    absolute = False
+            else:
+                values[letter] = float(value) * (units if letter in 'XYIJR' else 1)
+
+        if motion is None:
+            continue
+        # an arc without an end point is a full circle back to the current position
+        if not ('X' in values or 'Y' in values or motion in (2, 3) and any(k in values for k in 'IJR')):
+            continue
+        base = np.zeros(2) if absolute else current
+        end = np.array((
+            base[0] + values['X'] if 'X' in values else current[0],
+            base[1] + values['Y'] if 'Y' in values else current[1],
+        ))
+
+        if motion == 0:
+            buffer.new_stroke()
+        elif motion == 1:
+            buffer.line(current, end)
+        else:
+            clockwise = motion == 2
+            if 'R' in values:
+                # centre from the radius, a negative radius picks the arc over 180 degrees
+                radius = values['R']
+                chord = end - current
+                d = np.hypot(*chord)
+                if d == 0 or abs(radius) < d / 2:
+                    raise Exception(f'Invalid arc radius in G-code line: {line.strip()}')
+                h = math.sqrt(radius * radius - d * d / 4)
+                normal = np.array((-chord[1], chord[0])) / d
+                if (radius > 0) == clockwise:
+                    normal = -normal
+                center = current + chord / 2 + h * normal
+                radius = abs(radius)
+            elif 'I' in values or 'J' in values:
+                center = current + (values.get('I', 0.0), values.get('J', 0.0))
+                radius = float(np.hypot(*(current - center)))
+            else:
+                raise Exception(f'Arc without I, J or R in G-code line: {line.strip()}')
+            start = math.atan2(*(current - center)[::-1])
+            stop = math.atan2(*(end - center)[::-1])
+            sweep = stop - start
+            if clockwise and sweep >= 0:
+                sweep -= 2 * math.pi
+            elif not clockwise and sweep <= 0:
+                sweep += 2 * math.pi
+            buffer.arc(center, radius, start, sweep)
+        current = end
+
+    return buffer.build()
@@ -0,0 +1,266 @@
+'''
+Stateless kinematics for planar serial arms.
+
+Every function here is pure: it only reads an immutable ArmGeometry and its
+arguments, so one geometry can be shared between threads without locks.
+The array functions accept scalars or numpy arrays and broadcast.
+'''
+import math
+from dataclasses import dataclass, field
+
+import numpy as np
+
+import accel
+import metrics
+
+
+@dataclass(frozen=True, slots=True)
+class ArmGeometry:
+    '''
+    Immutable link lengths of a planar arm and the constants derived from them
+
+    Parameters:
+        lengths (tuple): the link lengths, base to end effector
+    '''
+    lengths: tuple
+    lengths_array: np.ndarray = field(init=False, repr=False, compare=False)
+    l1_sq: float = field(init=False, repr=False, compare=False)
+    l2_sq: float = field(init=False, repr=False, compare=False)
+    two_l1_l2: float = field(init=False, repr=False, compare=False)
+    min_reach: float = field(init=False, repr=False, compare=False)
+    max_reach: float = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        lengths = tuple(float(length) for length in self.lengths)
+        lengths_array = np.array(lengths, dtype=np.float64)
+        lengths_array.flags.writeable = False
+
+        set_ = object.__setattr__
+        set_(self, 'lengths', lengths)
+        set_(self, 'lengths_array', lengths_array)
+
+        # derived constants for the 2 linkage inverse kinematics
+        if len(lengths) == 2:
+            l1, l2 = lengths
+            set_(self, 'l1_sq', l1 * l1)
+            set_(self, 'l2_sq', l2 * l2)
+            set_(self, 'two_l1_l2', 2 * l1 * l2)
+        else:
+            set_(self, 'l1_sq', None)
+            set_(self, 'l2_sq', None)
+            set_(self, 'two_l1_l2', None)
+
+        # reachable annulus of the end effector
+        total = sum(lengths)
+        set_(self, 'max_reach', total)
+        set_(self, 'min_reach', max(0.0, 2 * max(lengths, default=0.0) - total))
+
+    def __len__(self):
+        return len(self.lengths)
+
+
+def _require_two_links(geom: ArmGeometry):
+    if geom.two_l1_l2 is None:
+        raise Exception('Inverse kinematics only works for 2 linkages')
+
+
+@metrics.timed('kinematics.inverse_point')
+def inverse_point(geom: ArmGeometry, target: tuple) -> tuple:
+    '''
+    Solves the inverse kinematics for a single target
+
+    Parameters:
+        geom (ArmGeometry): the arm geometry
+        target (tuple): the target position (x, y)
+
+    Returns:
+        tuple: the angles in degrees (a1, a2)
+    '''
+    if accel.compiled():
+        return accel.inverse_point(geom, target)
+    _require_two_links(geom)
+
+    # a_{2}=\arccos\left(\frac{x_{2}^{2}+y_{2}^{2}-l_{1}^{2}-l_{2}^{2}}{2l_{1}l_{2}}\right)
+    # a_{1}=\arctan\left(\frac{y_{2}}{x_{2}}\right)-\arctan\left(\frac{l_{2}\sin\left(a_{2}\right)}{l_{1}+l_{2}\cos\left(a_{2}\right)}\right)
+
+    x, y = target
+    l1, l2 = geom.lengths
+
+    try:
+        a2_rad = math.acos((x*x + y*y - geom.l1_sq - geom.l2_sq) / geom.two_l1_l2)
+    except ValueError:
+        metrics.count('kinematics.unreachable')
+        raise Exception('Position is out of reach')
+
+    # atan(y / x), plus pi for x < 0, without dividing by x so x == 0 gives +-90 degrees
+    base = math.atan2(y, x + 0.0)
+    if base < -math.pi / 2:
+        base += 2 * math.pi
+    den = l1 + l2 * math.cos(a2_rad)
+    elbow = math.atan(l2 * math.sin(a2_rad) / den) if den != 0 else math.pi / 2
+    a1_rad = base - elbow
+
+    return (math.degrees(a1_rad), math.degrees(a2_rad))
+
+
+def forward_point(geom: ArmGeometry, angles: tuple) -> tuple:
+    '''
+    Solves the forward kinematics for a single configuration
+
+    Parameters:
+        geom (ArmGeometry): the arm geometry
+        angles (tuple): the relative joint angles in degrees
+
+    Returns:
+        tuple: the end effector position (x, y)
+    '''
+    if accel.compiled():
+        return accel.forward_point(geom, angles)
+    cum_pos = (0, 0)
+    cum_angle = 0
+
+    for i, length in enumerate(geom.lengths):
+        cum_angle += angles[i]
+        cum_pos = (
+            cum_pos[0] + length * math.cos(math.radians(cum_angle)),
+            cum_pos[1] + length * math.sin(math.radians(cum_angle))
+        )
+    return cum_pos
+
+
+@metrics.timed('kinematics.inverse')
+def inverse(geom: ArmGeometry, x, y, strict: bool = True, branch=1) -> tuple:
+    '''
+    Solves the inverse kinematics for arrays of targets, by default on the same branch as inverse_point
+
+    Parameters:
+        geom (ArmGeometry): the arm geometry
+        x (array): the target x positions
+        y (array): the target y positions
+        strict (bool): raise if any target is out of reach, otherwise return nan for it (default: True)
+        branch (int or array): 1 for a2 >= 0 like inverse_point, -1 for the mirrored elbow (default: 1)
+
+    Returns:
+        tuple: arrays of angles in degrees (a1, a2)
+    '''
+    _require_two_links(geom)
+    x = np.asarray(x, dtype=np.float64) + 0.0  # -0.0 is 0.0, like inverse_point
+    y = np.asarray(y, dtype=np.float64)
+    l1, l2 = geom.lengths
+
+    cos_a2 = (x*x + y*y - geom.l1_sq - geom.l2_sq) / geom.two_l1_l2
+    with np.errstate(invalid='ignore', divide='ignore'):
+        a2_rad = np.arccos(cos_a2) * np.sign(branch)
+        # atan(y / x), plus pi for x < 0, without dividing by x, as in inverse_point
+        base = np.arctan2(y, x)
+        base = np.where(base < -np.pi / 2, base + 2 * np.pi, base)
+        # the elbow term is +-pi / 2 where its denominator vanishes, at the base of equal links
+        den = l1 + l2 * np.cos(a2_rad)
+        elbow = np.where(
+            den != 0,
+            np.arctan(l2 * np.sin(a2_rad) / den),
+            np.copysign(np.pi / 2, np.sin(a2_rad))
+        )
+        a1_rad = base - elbow
+
+    unreachable = ~(np.isfinite(a1_rad) & np.isfinite(a2_rad))
+    if np.any(unreachable):
+        metrics.count('kinematics.unreachable', int(np.count_nonzero(unreachable)))
+        if strict:
+            raise Exception('Position is out of reach')
+
+    return np.degrees(a1_rad), np.degrees(a2_rad)
+
+
+def link_positions(geom: ArmGeometry, angles) -> np.ndarray:
+    '''
+    Returns the joint positions of the arm, starting at the base and ending at the end effector
+
+    Parameters:
+        geom (ArmGeometry): the arm geometry
+        angles (array): relative joint angles in degrees, shape (..., n_links)
+
+    Returns:
+        np.ndarray: positions with shape (..., n_links + 1, 2)
+    '''
+    angles = np.asarray(angles, dtype=np.float64)
+    if angles.shape[-1] != len(geom):
+        raise Exception('Number of angles must match number of linkages')
+
+    cum_angle = np.radians(np.cumsum(angles, axis=-1))
+    steps = np.stack((
+        geom.lengths_array * np.cos(cum_angle),
+        geom.lengths_array * np.sin(cum_angle),
+    ), axis=-1)
+
+    positions = np.zeros(angles.shape[:-1] + (len(geom) + 1, 2))
+    np.cumsum(steps, axis=-2, out=positions[..., 1:, :])
+    return positions
+
+
+@metrics.timed('kinematics.forward')
+def forward(geom: ArmGeometry, angles) -> tuple:
+    '''
+    Solves the forward kinematics for arrays of configurations
+
+    Parameters:
+        geom (ArmGeometry): the arm geometry
+        angles (array): relative joint angles in degrees, shape (..., n_links)
+
+    Returns:
+        tuple: arrays of end effector positions (x, y)
+    '''
+    angles = np.asarray(angles, dtype=np.float64)
+    if angles.shape[-1] != len(geom):
+        raise Exception('Number of angles must match number of linkages')
+
+    cum_angle = np.radians(np.cumsum(angles, axis=-1))
+    return (
+        np.sum(geom.lengths_array * np.cos(cum_angle), axis=-1),
+        np.sum(geom.lengths_array * np.sin(cum_angle), axis=-1),
+    )
+
+
+def jacobian(geom: ArmGeometry, angles) -> np.ndarray:
+    '''
+    Returns the Jacobian of the end effector position with respect to the joint angles in radians
+
+    Parameters:
+        geom (ArmGeometry): the arm geometry
+        angles (array): relative joint angles in degrees, shape (..., n_links)
+
+    Returns:
+        np.ndarray: the Jacobians with shape (..., 2, n_links)
+    '''
+    angles = np.asarray(angles, dtype=np.float64)
+    if angles.shape[-1] != len(geom):
+        raise Exception('Number of angles must match number of linkages')
+
+    # joint i moves every link from i to the end effector
+    cum_angle = np.radians(np.cumsum(angles, axis=-1))
+    dx = -geom.lengths_array * np.sin(cum_angle)
+    dy = geom.lengths_array * np.cos(cum_angle)
+    return np.stack((
+        np.flip(np.cumsum(np.flip(dx, -1), axis=-1), -1),
+        np.flip(np.cumsum(np.flip(dy, -1), axis=-1), -1),
+    ), axis=-2)
+
+
+def manipulability(geom: ArmGeometry, angles) -> np.ndarray:
+    '''
+    Returns the Yoshikawa manipulability sqrt(det(J J^T)), which is 0 at singular configurations
+    and l1 * l2 * |sin(a2)| for 2 linkages
+
+    Parameters:
+        geom (ArmGeometry): the arm geometry
+        angles (array): relative joint angles in degrees, shape (..., n_links)
+
+    Returns:
+        np.ndarray: the manipulability with shape (...)
+    '''
+    if len(geom) == 2:
+        l1, l2 = geom.lengths
+        return l1 * l2 * np.abs(np.sin(np.radians(np.asarray(angles, dtype=np.float64)[..., 1])))
+    j = jacobian(geom, angles)
+    with np.errstate(invalid='ignore'):
+        return np.sqrt(np.maximum(np.linalg.det(j @ np.swapaxes(j, -1, -2)), 0))
@@ -0,0 +1,152 @@
+'''
+Level of detail for plotting long curves.
+
+A curve is kept at full resolution and only a pixel resolution reduction of the
+visible part is handed to matplotlib. Curves over increasing x, such as angles
+over time, are reduced to the first, lowest, highest and last sample of every
+pixel column. Other curves keep the points where they enter a new pixel, or
+enter and leave one of the regions around the view. The reduction is recomputed
+when the axes are zoomed, panned or resized.
+'''
+import numpy as np
+
+import metrics
+
+
+def envelope(x: np.ndarray, y: np.ndarray, lo: float, hi: float, columns: int) -> tuple:
+    '''
+    Reduces a curve over increasing x to at most four points per pixel column of [lo, hi]
+
+    Parameters:
+        x (array): the increasing x values
+        y (array): the y values
+        lo, hi (float): the visible x range
+        columns (int): the number of pixel columns of the visible range
+
+    Returns:
+        tuple: the reduced (x, y), including one point on each side of the visible range
+    '''
+    n = len(x)
+    start = max(int(np.searchsorted(x, lo, side='left')) - 1, 0)
+    stop = min(int(np.searchsorted(x, hi, side='right')) + 1, n)
+    x, y = x[start:stop], y[start:stop]
+    if len(x) <= 4 * columns or hi <= lo:
+        return x, y
+
+    # the points just outside the view get columns -1 and columns
+    column = np.clip(np.floor((x - lo) / (hi - lo) * columns), -1, columns).astype(np.int64)
+    firsts = np.flatnonzero(np.diff(column, prepend=column[0] - 1))
+    lasts = np.append(firsts[1:], len(x)) - 1
+    lows = np.minimum.reduceat(y, firsts)
+    highs = np.maximum.reduceat(y, firsts)
+    middle = (x[firsts] + x[lasts]) / 2
+
+    # first, lowest, highest and last of each column, in that order
+    out_x = np.stack((x[firsts], middle, middle, x[lasts]), axis=-1).ravel()
+    out_y = np.stack((y[firsts], lows, highs, y[lasts]), axis=-1).ravel()
+    return out_x, out_y
+
+
+def simplify(x: np.ndarray, y: np.ndarray, xlim: tuple, ylim: tuple, pixels: tuple) -> tuple:
+    '''
+    Reduces an arbitrary curve to the points that change pixel, or region around the view
+
+    A run of points in a pixel is replaced by its first point, and a run in one of the
+    8 regions around the view by the points where it enters and leaves the region. The
+    cells are convex, so the dropped part of the curve stays within about a pixel, or out
+    of the view, and the points kept outside the view do not grow as the view is zoomed in.
+
+    Parameters:
+        x, y (array): the curve
+        xlim, ylim (tuple): the visible range
+        pixels (tuple): the size of the visible range in pixels (width, height)
+
+    Returns:
+        tuple: the reduced (x, y)
+    '''
+    width = xlim[1] - xlim[0]
+    height = ylim[1] - ylim[0]
+    if len(x) <= 2 * (pixels[0] + pixels[1]) or width <= 0 or height <= 0:
+        return x, y
+
+    with np.errstate(invalid='ignore'):
+        u = (x - xlim[0]) / width
+        v = (y - ylim[0]) / height
+        # -1, 0 or 1 for before, within or after the view on each axis
+        region_u = np.clip(np.floor(np.nan_to_num(u, nan=-2)), -1, 1)
+        region_v = np.clip(np.floor(np.nan_to_num(v, nan=-2)), -1, 1)
+    inside = (region_u == 0) & (region_v == 0)
+
+    # cells inside the view are pixels, outside they are the 8 regions around the view,
+    # which are convex and do not grow in number as the view is zoomed in
+    cell_u = np.where(inside, np.floor(u * pixels[0]), region_u)
+    cell_v = np.where(inside, np.floor(v * pixels[1]), region_v)
+    change = (cell_u[1:] != cell_u[:-1]) | (cell_v[1:] != cell_v[:-1]) | (inside[1:] != inside[:-1])
+    # nan breaks the line, so keep it and its neighbours
+    change |= np.isnan(u[1:]) | np.isnan(u[:-1]) | np.isnan(v[1:]) | np.isnan(v[:-1])
+
+    keep = np.ones(len(x), dtype=bool)
+    keep[1:-1] = change[:-1] | (change[1:] & ~inside[1:-1])
+    return x[keep], y[keep]
+
+
+class LODLine:
+    '''
+    A matplotlib line that draws a pixel resolution reduction of its full resolution data
+
+    Parameters:
+        ax (Axes): the axes to plot on
+        x, y (array): the full resolution data
+        *args, **kwargs: passed to ax.plot, e.g. the format string
+        monotonic (bool): whether x is increasing, which allows the column envelope (default: None, detect)
+    '''
+
+    def __init__(self, ax, x, y, *args, monotonic: bool = None, **kwargs):
+        self.ax = ax
+        self.x = np.asarray(x, dtype=np.float64)
+        self.y = np.asarray(y, dtype=np.float64)
+        if monotonic is None:
+            monotonic = bool(np.all(np.diff(self.x) >= 0))
+        self.monotonic = monotonic
+        self._view = None
+
+        # autoscale to the full data, as plotting it would
+        finite = np.isfinite(self.x) & np.isfinite(self.y)
+        if finite.any():
+            fx, fy = self.x[finite], self.y[finite]
+            ax.update_datalim([(fx.min(), fy.min()), (fx.max(), fy.max())])
+            ax.autoscale_view()
+
+        (self.line,) = ax.plot(self.x[:0], self.y[:0], *args, **kwargs)
+        self.update()
+        ax.callbacks.connect('xlim_changed', self.update)
+        ax.callbacks.connect('ylim_changed', self.update)
+        ax.figure.canvas.mpl_connect('resize_event', self.update)
+
+    def update(self, *_):
+        '''
+        Recomputes the reduced data if the view or its size in pixels changed
+        '''
+        xlim = self.ax.get_xlim()
+        ylim = self.ax.get_ylim()
+        pixels = (max(int(self.ax.bbox.width), 1), max(int(self.ax.bbox.height), 1))
+        view = (xlim, ylim, pixels)
+        if view == self._view:
+            return
+        self._view = view
+
+        if self.monotonic:
+            lo, hi = sorted(xlim)
+            x, y = envelope(self.x, self.y, lo, hi, pixels[0])
+        else:
+            x, y = simplify(self.x, self.y, sorted(xlim), sorted(ylim), pixels)
+        metrics.observe('lod.vertices', len(x))
+        self.line.set_data(x, y)
+        self.ax.figure.canvas.draw_idle()
+
+
+def plot(ax, x, y, *args, **kwargs) -> LODLine:
+    '''
+    Same as ax.plot for a single curve, drawing it at the level of detail of the view
+    '''
+    return LODLine(ax, x, y, *args, **kwargs)
@@ -1,11 +1,21 @@
 import math
+import shutil
 import time
 import tkinter as tk
 
 import matplotlib.pyplot as plt
+import numpy as np
 from matplotlib.animation import FuncAnimation
 
+import kinematics
+import lod
+import metrics
+import paths
+from cache import Cache
+from cache import key as cache_key
 from scara import Scara
+from strokes import StrokeRecorder, strokes_trajectory
+from trajectory import LazyTrajectory, Trajectory
 
 
 def lerp(y0, y1, t):
@@ -31,6 +41,7 @@ def _multi_lerp(values, t):
         values (list): the values to interpolate between
         t (float): the interpolation value in [0, 1]
     '''
+    metrics.count('multi_lerp.calls')
     n = len(values)
     if n == 1:
         return values[0]
@@ -39,6 +50,7 @@ def _multi_lerp(values, t):
         for i in range(n-1):  # skip last value
             # if t in interval
             if t >= i / (n-1) and t <= (i+1) / (n-1):
+                metrics.observe('multi_lerp.scan', i+1)
                 # interpolate from y0 to y1 from t0 to t1 in the interval
                 y0, y1 = values[i], values[i+1]
                 t0, t1 = (i)/(n-1), (i+1)/(n-1)
@@ -46,6 +58,25 @@ def _multi_lerp(values, t):
                 return lerp(y0, y1, t_scaled)
 
 
+def _inverse_knots(scr: Scara, x: np.ndarray, y: np.ndarray, cache: Cache = None) -> tuple:
+    '''
+    Solves the sampled targets in one call, or loads the knots solved for the same geometry and targets
+
+    Returns:
+        tuple: lists of angles (a1s, a2s)
+    '''
+    if cache is not None:
+        key = cache_key('inverse', scr.geometry.lengths, x, y)
+        cached = cache.get_arrays(key)
+        if cached is not None:
+            return cached['a1s'].tolist(), cached['a2s'].tolist()
+
+    a1s, a2s = kinematics.inverse(scr.geometry, x, y)
+    if cache is not None:
+        cache.put_arrays(key, a1s=a1s, a2s=a2s)
+    return a1s.tolist(), a2s.tolist()
+
+
 def simulate(scr: Scara, f_a1, f_a2, map_int=100, model_int=10, link_opacity=0.3, name='Scara Robot Inverse Kinematics'):
     '''
     Simulates the scara robot with the given parameters and displays the config space and output space plots
@@ -67,7 +98,7 @@ def simulate(scr: Scara, f_a1, f_a2, map_int=100, model_int=10, link_opacity=0.3
     fig, axs = plt.subplots(1, 2, figsize=(
         10, 5), gridspec_kw={'width_ratios': [1, 1]})
     fig.suptitle(
-        f'{name}\nL1: {scr.links[0][0]} L2: {scr.links[1][0]}  | {map_int} Config Space Intervals | {model_int} Model Intervals')
+        f'{name}\nL1: {scr.lengths[0]:g} L2: {scr.lengths[1]:g}  | {map_int} Config Space Intervals | {model_int} Model Intervals')
 
     # setup the config space
     axs[0].set_title('Config Space')
@@ -85,61 +116,44 @@ def simulate(scr: Scara, f_a1, f_a2, map_int=100, model_int=10, link_opacity=0.3
     axs[1].set_ylabel('Y-axis')
     axs[1].set_xlabel('X-axis')
 
-    a1_t = [[], []]
-    a2_t = [[], []]
-    for t in range(0, map_int+1):
-        print(f'config space: {t}/{map_int}')
-        t = t / map_int
-        a1_t[0].append(t)
-        a1_t[1].append(f_a1(t))
-        a2_t[0].append(t)
-        a2_t[1].append(f_a2(t))
+    # sample the config space once, the output space reuses the same samples
+    print(f'config space: {map_int}/{map_int}')
+    ts = np.linspace(0, 1, map_int+1)
+    a1s = paths.sample(f_a1, ts)
+    a2s = paths.sample(f_a2, ts)
 
-    axs[0].plot(a1_t[0], a1_t[1], 'r-')
-    axs[0].plot(a2_t[0], a2_t[1], 'b-')
+    # long curves are drawn at the resolution of the view, see lod
+    lod.plot(axs[0], ts, a1s, 'r-')
+    lod.plot(axs[0], ts, a2s, 'b-')
 
+    geom = scr.geometry
     for t in range(0, model_int+1):
         print(f'start/end positions: {t}/{model_int}')
         t = t / model_int
-        scr.set_angles((f_a1(t), f_a2(t)))
-        cum_pos = (0, 0)
-        cum_angle = 0
-        for link in scr.links:
-            cum_angle += link[1]
-            new_pos = (
-                cum_pos[0] + link[0] * math.cos(math.radians(cum_angle)),
-                cum_pos[1] + link[0] * math.sin(math.radians(cum_angle))
-            )
+        positions = kinematics.link_positions(geom, (f_a1(t), f_a2(t)))
 
-            red = int(((1 - t) * 255)*link_opacity+255*(1-link_opacity))
-            blue = int((t * 255)*link_opacity+255*(1-link_opacity))
-            green = int(255*(1-link_opacity))
+        red = int(((1 - t) * 255)*link_opacity+255*(1-link_opacity))
+        blue = int((t * 255)*link_opacity+255*(1-link_opacity))
+        green = int(255*(1-link_opacity))
+        for cum_pos, new_pos in zip(positions[:-1], positions[1:]):
             axs[1].plot(
                 [cum_pos[0], new_pos[0]],
                 [cum_pos[1], new_pos[1]],
                 linewidth=2, color=f'#{red:02X}{green:02X}{blue:02X}'
             )
             # axs[1].plot([cum_pos[0]], [cum_pos[1]], 'k.') # plot the joints
-            cum_pos = new_pos
 
-    xy_t = [[], []]
-    for t in range(0, map_int+1):
-        print(f'output space: {t}/{map_int}')
-        t_float = t / map_int
-        angles = (f_a1(t_float), f_a2(t_float))
-        pos = scr.forward(angles)
-        xy_t[0].append(pos[0])
-        xy_t[1].append(pos[1])
-        if t == 0 or t == map_int:
-            axs[1].plot([pos[0]], [pos[1]], 'k.')
-
-    axs[1].plot(xy_t[0], xy_t[1], 'k-')
+    print(f'output space: {map_int}/{map_int}')
+    xs, ys = kinematics.forward(geom, np.column_stack((a1s, a2s)))
+    axs[1].plot([xs[0]], [ys[0]], 'k.')
+    axs[1].plot([xs[-1]], [ys[-1]], 'k.')
+    lod.plot(axs[1], xs, ys, 'k-')
 
     # Display the plot
     plt.show()
 
 
-def animate(scr: Scara, f_a1, f_a2, model_int=10, link_opacity=1, show=True, name='Scara Robot Inverse Kinematics'):
+def animate(scr: Scara, f_a1, f_a2, model_int=10, link_opacity=1, show=True, name='Scara Robot Inverse Kinematics', cache: Cache = None):
     '''
     Animates the scara robot with the given parameters
 
@@ -151,6 +165,7 @@ def animate(scr: Scara, f_a1, f_a2, model_int=10, link_opacity=1, show=True, nam
         link_opacity (float): the opacity of the links in output space (default: 1)
         show (bool): whether to show the animation (default: True)
         name (str): the name of the plot (default: 'Scara Robot Inverse Kinematics')
+        cache (Cache): reuse the GIF rendered earlier for the same arm, frames and parameters (default: None)
 
     Returns:
         None
@@ -158,9 +173,11 @@ def animate(scr: Scara, f_a1, f_a2, model_int=10, link_opacity=1, show=True, nam
     fig, ax = plt.subplots()
 
     fig.suptitle(
-        f'{name}\nL1: {scr.links[0][0]} L2: {scr.links[1][0]}  | {model_int} Model Intervals'
+        f'{name}\nL1: {scr.lengths[0]:g} L2: {scr.lengths[1]:g}  | {model_int} Model Intervals'
     )
 
+    geom = scr.geometry
+
     def frame(i, scr):
         t = (i+1) / model_int
 
@@ -171,38 +188,56 @@ def animate(scr: Scara, f_a1, f_a2, model_int=10, link_opacity=1, show=True, nam
         ax.set_ylabel('Y-axis')
         ax.set_aspect('equal', 'box')
 
-        scr.set_angles((f_a1(t), f_a2(t)))
-        cum_pos = (0, 0)
-        cum_angle = 0
-        for link in scr.links:
-            cum_angle += link[1]
-            new_pos = (
-                cum_pos[0] + link[0] * math.cos(math.radians(cum_angle)),
-                cum_pos[1] + link[0] * math.sin(math.radians(cum_angle))
-            )
+        positions = kinematics.link_positions(geom, (f_a1(t), f_a2(t)))
 
-            red = int(((1 - t) * 255)*link_opacity+255*(1-link_opacity))
-            blue = int((t * 255)*link_opacity+255*(1-link_opacity))
-            green = int(255*(1-link_opacity))
+        red = int(((1 - t) * 255)*link_opacity+255*(1-link_opacity))
+        blue = int((t * 255)*link_opacity+255*(1-link_opacity))
+        green = int(255*(1-link_opacity))
+        for cum_pos, new_pos in zip(positions[:-1], positions[1:]):
             ax.plot(
                 [cum_pos[0], new_pos[0]],
                 [cum_pos[1], new_pos[1]],
                 linewidth=2, color=f'#{red:02X}{green:02X}{blue:02X}'
             )
             ax.plot([cum_pos[0]], [cum_pos[1]], 'k.')  # plot the joints
-            cum_pos = new_pos
         print(f'frame: {i+1}/{model_int} rendered')
 
-    anim = FuncAnimation(
-        fig, frame, fargs=(scr,), interval=1, frames=model_int, repeat=True
-    )
-    anim.save('scara.gif', writer='imagemagick', fps=60)
+    def make_animation():
+        return FuncAnimation(
+            fig, frame, fargs=(scr,), interval=1, frames=model_int, repeat=True
+        )
+
+    anim = None
+    if cache is None:
+        anim = make_animation()
+        anim.save('scara.gif', writer='imagemagick', fps=60)
+    else:
+        # the frames only depend on the angles at the frame times and the render parameters
+        frame_ts = np.arange(1, model_int+1) / model_int
+        key = cache_key(
+            'animate', geom.lengths, paths.sample(f_a1, frame_ts), paths.sample(f_a2, frame_ts),
+            link_opacity, name, 60
+        )
+        gif = cache.get(key, 'gif')
+        try:
+            if gif is None:
+                raise FileNotFoundError
+            shutil.copyfile(gif, 'scara.gif')
+        except FileNotFoundError:  # not cached, or evicted by another process since get
+            anim = make_animation()
+            anim.save('scara.gif', writer='imagemagick', fps=60)
+            cache.put_file(key, 'gif', lambda tmp: shutil.copyfile('scara.gif', tmp))
 
     if show:
+        if anim is None:
+            anim = make_animation()  # cached, so only rendered to be shown
         plt.show()
+    elif anim is None:
+        plt.close(fig)
 
 
-def basic_invk(scr: Scara, start: tuple, end: tuple, intervals: int) -> tuple:
+@metrics.timed('basic_invk')
+def basic_invk(scr: Scara, start: tuple, end: tuple, intervals: int, trajectory: bool = False, cache: Cache = None) -> tuple:
     '''
     Returns a tuple of functions for the inverse kinematics of the scara robot
     that moves from the start position to the end position linearly
@@ -212,25 +247,28 @@ def basic_invk(scr: Scara, start: tuple, end: tuple, intervals: int) -> tuple:
         start (tuple): the starting position
         end (tuple): the ending position
         intervals (int): the number of intervals to approximate the inverse kinematics with
+        trajectory (bool): return the solved knots as a Trajectory instead (default: False)
+        cache (Cache): reuse knots solved earlier for the same geometry and samples (default: None)
 
     Returns:
         tuple: a tuple of functions for a1 and a2 over t
     '''
-    # list of angles
-    a1s = []
-    a2s = []
+    # samples at the middle of each interval
+    # ts = (np.arange(intervals) + .5) / intervals
 
-    for i in range(intervals):
-        # samples at the middle of each interval
-        # t = 1/intervals*(i+.5)
+    # samples at the left of each interval
+    ts = np.arange(intervals) / intervals
 
-        # samples at the left of each interval
-        t = 1/intervals*i
+    # solve every target in one call
+    x, y = lerp(start[0], end[0], ts), lerp(start[1], end[1], ts)
+    a1s, a2s = _inverse_knots(scr, x, y, cache)
 
-        target = lerp(start[0], end[0], t), lerp(start[1], end[1], t)
-        a1, a2 = scr.inverse(target)
-        a1s.append(a1)
-        a2s.append(a2)
+    if trajectory:
+        # _multi_lerp spreads the knots evenly over [0, 1]
+        return Trajectory(
+            np.linspace(0, 1, len(a1s)), np.column_stack((a1s, a2s)), scr.lengths,
+            metadata={'source': 'basic_invk', 'intervals': intervals}
+        )
 
     def a1(t: float) -> float:
         return _multi_lerp(a1s, t)
@@ -241,27 +279,35 @@ def basic_invk(scr: Scara, start: tuple, end: tuple, intervals: int) -> tuple:
     return a1, a2
 
 
-def path_invk(scr: Scara, path, intervals: int) -> tuple:
+@metrics.timed('path_invk')
+def path_invk(scr: Scara, path, intervals: int, trajectory: bool = False, cache: Cache = None) -> tuple:
     '''
     Returns a tuple of functions for the inverse kinematics of the scara robot
     that moves along the given path
 
     Parameters:
         scr (Scara): the scara robot to animate
-        path (function): a parametric function that takes a float t and returns a tuple of the target position
+        path (function): a parametric function that takes a float t and returns a tuple of the target position,
+            paths that accept a numpy array of t are called once for all samples
+        intervals (int): the number of intervals to approximate the inverse kinematics with
+        trajectory (bool): return the solved knots as a Trajectory instead (default: False)
+        cache (Cache): reuse knots solved earlier for the same geometry and samples (default: None)
 
+    Returns:
+        tuple: a tuple of functions for a1 and a2 over t
     '''
+    ts = (np.arange(intervals) + .5) / intervals  # samples at the middle of each interval
 
-    # list of angles
-    a1s = []
-    a2s = []
+    # sample the path and solve every target in one call
+    x, y = paths.sample_path(path, ts)
+    a1s, a2s = _inverse_knots(scr, x, y, cache)
 
-    for i in range(intervals):
-        t = 1/intervals*(i+.5)  # samples at the middle of each interval
-        target = path(t)
-        a1, a2 = scr.inverse(target)
-        a1s.append(a1)
-        a2s.append(a2)
+    if trajectory:
+        # _multi_lerp spreads the knots evenly over [0, 1]
+        return Trajectory(
+            np.linspace(0, 1, len(a1s)), np.column_stack((a1s, a2s)), scr.lengths,
+            metadata={'source': 'path_invk', 'intervals': intervals}
+        )
 
     def a1(t: float) -> float:
         return _multi_lerp(a1s, t)
@@ -272,8 +318,37 @@ def path_invk(scr: Scara, path, intervals: int) -> tuple:
     return a1, a2
 
 
-def draw_path(size):
-    raw_points = []
+def lazy_invk(scr: Scara, path, memo: int = 256) -> tuple:
+    '''
+    Returns a tuple of functions for the inverse kinematics of the scara robot
+    that follows the given path exactly, solving it on demand wherever the functions are evaluated
+
+    Parameters:
+        scr (Scara): the scara robot to animate
+        path (function): a parametric function that takes a float t and returns a tuple of the target position
+        memo (int): the number of recent evaluations to remember (default: 256)
+
+    Returns:
+        tuple: a tuple of functions for a1 and a2 over t
+    '''
+    return LazyTrajectory(scr.geometry, path, memo=memo, metadata={'source': 'lazy_invk'}).functions()
+
+
+def draw_strokes(size, scr: Scara = None, fps: int = 60, min_dist: float = 2, min_interval: float = 1/240) -> list:
+    '''
+    Opens a window to draw one or more strokes with the mouse and returns them once "Done" is clicked
+
+    Parameters:
+        size (float): the width and height of the drawing area in output space
+        scr (Scara): if given, draw the arm and make it follow the cursor live (default: None)
+        fps (int): the rate the live arm is redrawn at (default: 60)
+        min_dist (float): the minimum distance in pixels between recorded points (default: 2)
+        min_interval (float): the minimum time in seconds between recorded points (default: 1/240)
+
+    Returns:
+        list: the strokes in drawing order, each an (n, 2) array of positions
+    '''
+    recorder = StrokeRecorder(min_dist=min_dist * size / 850, min_interval=min_interval)
 
     app = tk.Tk()
     app.title("Draw a path")
@@ -281,52 +356,136 @@ def draw_path(size):
     canvas = tk.Canvas(app)
     canvas.pack(anchor='nw', fill='both', expand=1)
 
-    def get_pos(event):
-        global last_x, last_y
-        last_x, last_y = event.x, event.y
-
-    def draw(event):
-        global last_x, last_y
-        canvas.create_line(
-            (last_x, last_y, event.x, event.y),
-            fill='blue',
-            width=6
-        )
-        last_x, last_y = event.x, event.y
+    def to_canvas(pos):
+        return (pos[0] / size + .5) * 850, (-pos[1] / size + .5) * 850
 
+    def to_output(event):
         # limit x and y to [0, 850]
-
         x = max(min(event.x, 850), 0) / 850 - .5
         y = max(min(event.y, 850), 0) / 850 - .5
+        return x * size, -y * size
+
+    # live follow mode, the link items are created once and moved in place
+    live = {'angles': None, 'reachable': True, 'scheduled': False}
+    if scr is not None:
+        geom = scr.geometry
+        live['angles'] = tuple(scr.angles.tolist())
+        link_items = [
+            canvas.create_line(0, 0, 0, 0, fill='gray', width=8, capstyle=tk.ROUND)
+            for _ in geom.lengths
+        ]
+
+        def render_arm():
+            live['scheduled'] = False
+            positions = kinematics.link_positions(geom, live['angles'])
+            color = 'gray' if live['reachable'] else 'red'
+            for item, start, end in zip(link_items, positions[:-1], positions[1:]):
+                canvas.coords(item, *to_canvas(start), *to_canvas(end))
+                canvas.itemconfigure(item, fill=color)
+
+    def follow(pos):
+        if scr is None:
+            return
+        # solve each motion event, but only redraw at the display rate
+        try:
+            live['angles'] = kinematics.inverse_point(geom, pos)
+            live['reachable'] = True
+        except Exception:
+            live['reachable'] = False  # hold the last reachable pose
+        if not live['scheduled']:
+            live['scheduled'] = True
+            app.after(1000 // fps, render_arm)
+
+    # one polyline item per stroke, new points are appended to it in place
+    stroke = {'item': None}
+
+    def to_pixels(points):
+        return (np.asarray(points) / size * [850, -850] + 425).ravel().tolist()
+
+    def redraw_stroke(points):
+        coords = to_pixels(points)
+        if len(coords) == 2:
+            coords *= 2  # a line needs at least two points
+        canvas.coords(stroke['item'], *coords)
+
+    def start_stroke(event):
+        pos = to_output(event)
+        recorder.begin(*pos, time=event.time / 1000)
+        stroke['item'] = canvas.create_line(
+            *to_pixels([pos, pos]), fill='blue', width=6, capstyle=tk.ROUND, joinstyle=tk.ROUND
+        )
+        if scr is not None:
+            canvas.tag_raise(stroke['item'])
+            for item in link_items:
+                canvas.tag_raise(item)
+        follow(pos)
 
-        x *= size
-        y *= size
+    def draw(event):
+        pos = to_output(event)
+        if recorder.add(*pos, time=event.time / 1000):
+            # only the new point, replacing every coordinate would be quadratic in the stroke length
+            canvas.insert(stroke['item'], 'end', to_pixels(pos))
+        follow(pos)
 
-        raw_points.append((x, -y))
+    def end_stroke(event):
+        if recorder.current is not None:
+            recorder.end()
+            redraw_stroke(recorder.strokes[-1])  # includes the last throttled point
 
     def finish_drawing():
+        recorder.end()
         app.quit()  # Exit the main loop when the "Done" button is clicked
         app.destroy()
 
-    canvas.bind("<Button-1>", get_pos)
+    canvas.bind("<Button-1>", start_stroke)
     canvas.bind("<B1-Motion>", draw)
+    canvas.bind("<ButtonRelease-1>", end_stroke)
 
     done_button = tk.Button(app, text="Done", command=finish_drawing)
     done_button.pack(side=tk.BOTTOM)
 
+    if scr is not None:
+        render_arm()
+
     app.mainloop()
 
-    if len(raw_points) < 2:
+    return recorder.strokes
+
+
+def draw_path(size, scr: Scara = None, fps: int = 60):
+    '''
+    Opens a window to draw a path with the mouse and returns it once "Done" is clicked,
+    multiple strokes are joined end to end by straight segments
+
+    This gives a single path for path_invk and other path consumers. To plan the strokes
+    separately, with the arm travelling between them instead of drawing the joins, pass
+    the result of draw_strokes to strokes.order_strokes and strokes.strokes_trajectory.
+
+    Parameters:
+        size (float): the width and height of the drawing area in output space
+        scr (Scara): if given, draw the arm and make it follow the cursor live (default: None)
+        fps (int): the rate the live arm is redrawn at (default: 60)
+
+    Returns:
+        function: a parametric function of t in [0, 1] returning the drawn position
+    '''
+    strokes = draw_strokes(size, scr=scr, fps=fps)
+    points = np.concatenate(strokes) if strokes else np.empty((0, 2))
+
+    if len(points) < 2:
         print('Not enough points')
         exit()
 
-    # unzip the points
-    x, y = zip(*raw_points)
+    # the points are spread evenly over t, like _multi_lerp
+    ts = np.linspace(0, 1, len(points))
+    x = points[:, 0].copy()
+    y = points[:, 1].copy()
 
+    @paths.vectorized
     def path(t):
         return (
-            _multi_lerp(x, t),
-            _multi_lerp(y, t)
+            np.interp(t, ts, x),
+            np.interp(t, ts, y)
         )
 
     return path
@@ -335,6 +494,7 @@ def draw_path(size):
 if __name__ == '__main__':
     links = [50, 50]  # 50mm linkages
     scr = Scara(links)
+    cache = Cache()  # reruns with the same inputs reuse the solved knots and GIFs
 
     start = (-40, 50)
     end = (25, -25)
@@ -355,12 +515,12 @@ if __name__ == '__main__':
     )
 
     animate(
-        Scara(links), a1_t, a2_t, model_int=120, show=True,
+        Scara(links), a1_t, a2_t, model_int=120, show=True, cache=cache,
         name='Linear Angle IK'
     )
 
     # Nonlinear IK demo
-    a1_t, a2_t = basic_invk(scr, start, end, 100)
+    a1_t, a2_t = basic_invk(scr, start, end, 100, cache=cache)
 
     simulate(
         scr, a1_t, a2_t, map_int=100, model_int=100, link_opacity=0.2,
@@ -368,7 +528,7 @@ if __name__ == '__main__':
     )
 
     animate(
-        Scara(links), a1_t, a2_t, model_int=120, show=True,
+        Scara(links), a1_t, a2_t, model_int=120, show=True, cache=cache,
         name='Linear Path IK - sahilss2'
     )
 
@@ -376,7 +536,7 @@ if __name__ == '__main__':
     # \left(150t-75,\frac{50}{1+\left(5\left(t-.5\right)\right)^{2}}\right)
     def path(t): return (150*t-75, 50/(1+(5*(t-.5))**2))
 
-    a1_t, a2_t = path_invk(scr, path, 100)
+    a1_t, a2_t = path_invk(scr, path, 100, cache=cache)
 
     simulate(
         scr, a1_t, a2_t, map_int=100, model_int=100, link_opacity=0.2,
@@ -384,17 +544,22 @@ if __name__ == '__main__':
     )
 
     animate(
-        Scara(links), a1_t, a2_t, model_int=120, show=True,
+        Scara(links), a1_t, a2_t, model_int=120, show=True, cache=cache,
         name='Path IK'
     )
 
     # Draw path IK demo
+    # the strokes are ordered to minimize joint travel and joined by joint space moves,
+    # rather than by straight lines the pen would draw
     size = (links[0]+links[1])/math.sqrt(2)*2
-    path = draw_path(size)
+    strokes = draw_strokes(size, scr=scr)
+    if not strokes:
+        print('Not enough points')
+        exit()
 
     time.sleep(1)
 
-    a1_t, a2_t = path_invk(scr, path, 100)
+    a1_t, a2_t = strokes_trajectory(scr.geometry, strokes).functions()
 
     simulate(
         scr, a1_t, a2_t, map_int=100, model_int=100, link_opacity=0.2,
@@ -402,6 +567,6 @@ if __name__ == '__main__':
     )
 
     animate(
-        Scara(links), a1_t, a2_t, model_int=120, show=True,
+        Scara(links), a1_t, a2_t, model_int=120, show=True, cache=cache,
         name='Path IK'
     )
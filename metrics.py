@@ -0,0 +1,151 @@
+'''
+Opt-in hot path instrumentation.
+
+Counters, timers and observed values (e.g. interpolation scan lengths) are only
+recorded after enable() is called. While disabled every hook is a single flag check.
+'''
+import json
+import time
+from functools import wraps
+
+MAX_SAMPLES = 10000  # samples kept per series for percentiles
+
+_enabled = False
+_counters = {}
+_series = {}
+
+
+class _Series:
+    __slots__ = ('count', 'total', 'min', 'max', 'samples', '_next')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = float('inf')
+        self.max = float('-inf')
+        self.samples = []
+        self._next = 0
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+        # keep the most recent MAX_SAMPLES values in a ring
+        if len(self.samples) < MAX_SAMPLES:
+            self.samples.append(value)
+        else:
+            self.samples[self._next] = value
+            self._next = (self._next + 1) % MAX_SAMPLES
+
+    def summary(self) -> dict:
+        ordered = sorted(self.samples)
+
+        def percentile(p):
+            if not ordered:
+                return None
+            return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))]
+
+        return {
+            'count': self.count,
+            'total': self.total,
+            'mean': self.total / self.count if self.count else None,
+            'min': self.min if self.count else None,
+            'max': self.max if self.count else None,
+            'p50': percentile(50),
+            'p90': percentile(90),
+            'p99': percentile(99),
+        }
+
+
+def enable():
+    global _enabled
+    _enabled = True
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+def reset():
+    '''
+    Clears all recorded counters and series
+    '''
+    _counters.clear()
+    _series.clear()
+
+
+def count(name: str, n: int = 1):
+    '''
+    Increments the counter with the given name by n if metrics are enabled
+    '''
+    if _enabled:
+        _counters[name] = _counters.get(name, 0) + n
+
+
+def observe(name: str, value: float):
+    '''
+    Records a value (e.g. a scan length) in the series with the given name if metrics are enabled
+    '''
+    if _enabled:
+        series = _series.get(name)
+        if series is None:
+            series = _series[name] = _Series()
+        series.add(value)
+
+
+def timed(name: str = None):
+    '''
+    Decorator that records the call count and duration (in seconds) of a function
+
+    Parameters:
+        name (str): the name of the series (default: the qualified function name)
+
+    Returns:
+        function: the decorator
+    '''
+    def decorator(fn):
+        key = name or f'{fn.__module__}.{fn.__qualname__}'
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                observe(key, time.perf_counter() - start)
+
+        return wrapper
+
+    return decorator
+
+
+def snapshot() -> dict:
+    '''
+    Returns a snapshot of all recorded metrics
+
+    Returns:
+        dict: {'enabled': bool, 'counters': {name: int}, 'series': {name: summary dict}}
+    '''
+    return {
+        'enabled': _enabled,
+        'counters': dict(_counters),
+        'series': {name: series.summary() for name, series in _series.items()},
+    }
+
+
+def to_json(indent: int = 2) -> str:
+    '''
+    Returns the current snapshot as a JSON string
+    '''
+    return json.dumps(snapshot(), indent=indent)
@@ -0,0 +1,155 @@
+'''
+Vectorized parametric paths.
+
+Paths are functions of t in [0, 1] returning a target position (x, y). Functions
+that work on numpy arrays are called once with every sample time instead of once
+per sample. Functions marked with @vectorized are trusted to, any other function
+is tried with an array and falls back to a per-sample loop if that fails.
+The primitives below are all vectorized.
+'''
+import math
+
+import numpy as np
+
+import metrics
+
+
+def vectorized(fn):
+    '''
+    Marks a function of t as accepting numpy arrays of t
+    '''
+    fn.vectorized = True
+    return fn
+
+
+def _call_vectorized(fn, ts: np.ndarray):
+    # returns the result of fn on the whole array, or None if fn only handles scalars
+    try:
+        with np.errstate(all='ignore'):
+            return fn(ts)
+    except (TypeError, ValueError):
+        return None
+
+
+def sample(fn, ts) -> np.ndarray:
+    '''
+    Evaluates a scalar valued function of t at every t in ts
+
+    Parameters:
+        fn (function): a function of t, e.g. an angle function from path_invk
+        ts (array): the sample times
+
+    Returns:
+        np.ndarray: the values, with the shape of ts
+    '''
+    ts = np.asarray(ts, dtype=np.float64)
+    values = _call_vectorized(fn, ts)
+    if values is not None:
+        values = np.asarray(values, dtype=np.float64)
+        if values.shape == ts.shape or values.ndim == 0:
+            return np.broadcast_to(values, ts.shape).copy()
+
+    metrics.count('paths.scalar_fallback')
+    return np.array([fn(t) for t in ts.ravel()], dtype=np.float64).reshape(ts.shape)
+
+
+def sample_path(path, ts) -> tuple:
+    '''
+    Evaluates a path at every t in ts
+
+    Parameters:
+        path (function): a parametric function of t returning a position (x, y)
+        ts (array): the sample times
+
+    Returns:
+        tuple: the x and y arrays, with the shape of ts
+    '''
+    ts = np.asarray(ts, dtype=np.float64)
+    points = _call_vectorized(path, ts)
+    if points is not None:
+        try:
+            x, y = points
+            x = np.broadcast_to(np.asarray(x, dtype=np.float64), ts.shape)
+            y = np.broadcast_to(np.asarray(y, dtype=np.float64), ts.shape)
+            return x.copy(), y.copy()
+        except (TypeError, ValueError):
+            pass
+    if getattr(path, 'vectorized', False):
+        raise Exception('Vectorized path must return a pair of arrays (x, y)')
+
+    metrics.count('paths.scalar_fallback')
+    points = np.array([path(t) for t in ts.ravel()], dtype=np.float64).reshape(ts.shape + (2,))
+    return points[..., 0], points[..., 1]
+
+
+def line(start: tuple, end: tuple):
+    '''
+    Returns a path moving linearly from start to end
+    '''
+    (x0, y0), (x1, y1) = start, end
+
+    @vectorized
+    def path(t):
+        return x0 + (x1 - x0) * t, y0 + (y1 - y0) * t
+
+    return path
+
+
+def arc(center: tuple, radius: float, start_angle: float, end_angle: float):
+    '''
+    Returns a path along a circular arc, angles in degrees counterclockwise from the x-axis
+    '''
+    cx, cy = center
+    a0 = math.radians(start_angle)
+    a1 = math.radians(end_angle)
+
+    @vectorized
+    def path(t):
+        a = a0 + (a1 - a0) * np.asarray(t)
+        return cx + radius * np.cos(a), cy + radius * np.sin(a)
+
+    return path
+
+
+def polyline(points):
+    '''
+    Returns a path through the points at constant speed along the polyline
+    '''
+    points = np.array(points, dtype=np.float64)
+    if len(points) < 2:
+        raise Exception('A polyline needs at least 2 points')
+
+    # parameterize by arc length
+    lengths = np.hypot(*np.diff(points, axis=0).T)
+    knots = np.concatenate(([0.0], np.cumsum(lengths)))
+    knots = knots / knots[-1] if knots[-1] > 0 else np.linspace(0, 1, len(points))
+    xs = points[:, 0].copy()
+    ys = points[:, 1].copy()
+
+    @vectorized
+    def path(t):
+        return np.interp(t, knots, xs), np.interp(t, knots, ys)
+
+    return path
+
+
+def bezier(*control_points):
+    '''
+    Returns a Bezier curve of any degree through the control points, e.g. 3 for quadratic and 4 for cubic
+    '''
+    control = np.array(control_points, dtype=np.float64)
+    if len(control) < 2:
+        raise Exception('A Bezier curve needs at least 2 control points')
+    degree = len(control) - 1
+    binomials = np.array([math.comb(degree, k) for k in range(degree + 1)], dtype=np.float64)
+    ks = np.arange(degree + 1)
+
+    @vectorized
+    def path(t):
+        t = np.asarray(t, dtype=np.float64)[..., None]
+        # Bernstein basis, shape (..., degree + 1)
+        basis = binomials * t**ks * (1 - t)**(degree - ks)
+        point = basis @ control
+        return point[..., 0][()], point[..., 1][()]
+
+    return path
@@ -0,0 +1,162 @@
+'''
+Incremental re-planning of trajectories built from path segments.
+
+The path is a sequence of segments, each a parametric function of its own t in
+[0, 1] owning an equal share of the trajectory time and a contiguous range of knots.
+Editing a segment resamples and re-solves only its knots, plus a few knots on each
+side so the elbow branch and the unwrapped angles stay continuous. The tracking
+error is only rechecked for the segments whose knots changed.
+'''
+import numpy as np
+
+import kinematics
+import paths
+from branches import optimize_branches
+from trajectory import Trajectory
+
+
+class EditableTrajectory:
+    '''
+    Trajectory over a list of path segments that can be edited one segment at a time
+
+    Parameters:
+        geom (ArmGeometry): the arm geometry
+        segments (list): the path segments, functions of t in [0, 1] returning the target position
+        intervals (int): the number of knots per segment (default: 100)
+        margin (int): the number of neighbouring knots re-solved on each side of an edit (default: 2)
+        cost (str): the branch optimization cost, see branches.optimize_branches (default: 'time')
+    '''
+
+    def __init__(self, geom, segments: list, intervals: int = 100, margin: int = 2, cost: str = 'time'):
+        if not segments:
+            raise Exception('At least one segment is needed')
+        self.geom = geom
+        self.segments = list(segments)
+        self.margin = margin
+        self.cost = cost
+
+        # knot ranges of each segment, bounds[k]:bounds[k + 1]
+        counts = [intervals] * len(self.segments)
+        self.bounds = np.concatenate(([0], np.cumsum(counts)))
+
+        self.ts = np.concatenate([self._segment_ts(k, n) for k, n in enumerate(counts)])
+        self.targets = np.concatenate([self._segment_targets(k, n) for k, n in enumerate(counts)])
+        self.angles = np.empty((len(self.ts), 2))
+        self.branches = np.empty(len(self.ts), dtype=int)
+        self.errors = np.zeros(len(self.segments))
+
+        self._solve(0, len(self.ts))
+        for k in range(len(self.segments)):
+            self._check(k)
+
+    def _segment_ts(self, k: int, n: int) -> np.ndarray:
+        # samples at the middle of each interval of the segment, in trajectory time
+        return (k + (np.arange(n) + .5) / n) / len(self.segments)
+
+    def _segment_targets(self, k: int, n: int) -> np.ndarray:
+        x, y = paths.sample_path(self.segments[k], (np.arange(n) + .5) / n)
+        return np.column_stack((x, y))
+
+    def _solve(self, lo: int, hi: int):
+        '''
+        Solves knots lo:hi, keeping them continuous with the knots on either side
+        '''
+        n = len(self.ts)
+        start = self.angles[lo - 1] if lo > 0 else None
+        end = self.angles[hi] if hi < n else None
+        # the neighbouring knots keep their branch, so the range can only switch to it at a flip point
+        branches, angles, _ = optimize_branches(
+            self.geom, self.targets[lo:hi, 0], self.targets[lo:hi, 1],
+            cost=self.cost, start_angles=start, end_angles=end,
+            start_branch=self.branches[lo - 1] if lo > 0 else None,
+            end_branch=self.branches[hi] if hi < n else None,
+        )
+
+        # unwrap onto the previous knot, then shift the following knots by whole turns if needed
+        if start is not None:
+            angles += 360 * np.round((start - angles[0]) / 360)
+        if end is not None:
+            turns = np.round((angles[-1] - end) / 360)
+            if np.any(turns):
+                self.angles[hi:] += 360 * turns
+
+        self.angles[lo:hi] = angles
+        self.branches[lo:hi] = branches
+
+    def _check(self, k: int, check_int: int = None):
+        '''
+        Measures the largest end effector deviation from segment k
+        '''
+        lo, hi = self.bounds[k], self.bounds[k + 1]
+        check_int = check_int or 4 * (hi - lo)
+        local = np.linspace(0, 1, check_int + 1)
+        ts = (k + local) / len(self.segments)
+
+        angles = np.column_stack([np.interp(ts, self.ts, self.angles[:, j]) for j in range(2)])
+        fx, fy = kinematics.forward(self.geom, angles)
+        px, py = paths.sample_path(self.segments[k], local)
+        self.errors[k] = float(np.hypot(fx - px, fy - py).max())
+
+    def set_segment(self, k: int, path, intervals: int = None) -> tuple:
+        '''
+        Replaces segment k and re-solves only the knots that depend on it
+
+        Parameters:
+            k (int): the index of the segment
+            path (function): the new segment, a function of t in [0, 1] returning the target position
+            intervals (int): the new number of knots of the segment (default: None, keep the current number)
+
+        Returns:
+            tuple: the (lo, hi) range of knots that were re-solved
+        '''
+        lo, hi = int(self.bounds[k]), int(self.bounds[k + 1])
+        n = intervals or hi - lo
+        # the edit is all or nothing, an unreachable target leaves the trajectory as it was
+        saved = {name: getattr(self, name).copy() for name in ('bounds', 'ts', 'targets', 'angles', 'branches', 'errors')}
+        saved['segments'] = list(self.segments)
+        try:
+            return self._set_segment(k, path, lo, hi, n)
+        except BaseException:
+            for name, value in saved.items():
+                setattr(self, name, value)
+            raise
+
+    def _set_segment(self, k: int, path, lo: int, hi: int, n: int) -> tuple:
+        self.segments[k] = path
+        targets = self._segment_targets(k, n)
+
+        if n != hi - lo:
+            # splice the resized knot range in, the other segments keep their knots
+            keep = slice(None, lo), slice(hi, None)
+            self.ts = np.concatenate((self.ts[keep[0]], self._segment_ts(k, n), self.ts[keep[1]]))
+            self.targets = np.concatenate((self.targets[keep[0]], targets, self.targets[keep[1]]))
+            self.angles = np.concatenate((self.angles[keep[0]], np.empty((n, 2)), self.angles[keep[1]]))
+            self.branches = np.concatenate((self.branches[keep[0]], np.empty(n, dtype=int), self.branches[keep[1]]))
+            self.bounds[k + 1:] += n - (hi - lo)
+            hi = lo + n
+        else:
+            self.targets[lo:hi] = targets
+
+        dirty = max(0, lo - self.margin), min(len(self.ts), hi + self.margin)
+        self._solve(*dirty)
+
+        # the margins reach into the neighbouring segments
+        for j in range(max(0, k - 1), min(len(self.segments), k + 2)):
+            if self.bounds[j] < dirty[1] and self.bounds[j + 1] > dirty[0]:
+                self._check(j)
+        return dirty
+
+    def trajectory(self) -> Trajectory:
+        '''
+        Returns the current knots as a Trajectory
+        '''
+        return Trajectory(self.ts, self.angles, self.geom.lengths, metadata={
+            'source': 'EditableTrajectory', 'segments': len(self.segments),
+            'max_error': float(self.errors.max()),
+        })
+
+    def functions(self) -> tuple:
+        '''
+        Returns a tuple of functions of t for a1 and a2, as used by simulate and animate
+        '''
+        return self.trajectory().functions()
@@ -1,17 +1,118 @@
 import math
 import matplotlib.pyplot as plt
+import numpy as np
+
+import kinematics
+import metrics
+
+
+class _Link:
+    __slots__ = ('_arm', '_i')
+
+    def __init__(self, arm, i):
+        self._arm = arm
+        self._i = i
+
+    def _array(self, key):
+        if key == 0 or key == -2:
+            return self._arm.lengths
+        if key == 1 or key == -1:
+            return self._arm.angles
+        raise IndexError('link index out of range')
+
+    def __getitem__(self, key):
+        return self._array(key)[self._i].item()
+
+    def __setitem__(self, key, value):
+        if key == 0 or key == -2:
+            # the geometry is immutable, so changing a length swaps in a new one
+            lengths = list(self._arm.geometry.lengths)
+            lengths[self._i] = value
+            self._arm._set_geometry(kinematics.ArmGeometry(tuple(lengths)))
+        else:
+            self._array(key)[self._i] = value
+
+    def __len__(self):
+        return 2
+
+    def __iter__(self):
+        yield self[0]
+        yield self[1]
+
+    def __eq__(self, other):
+        return list(self) == list(other)
+
+    def __repr__(self):
+        return repr(list(self))
+
+
+class _LinkView:
+    '''
+    Compatibility view of the arm as a list of [length, angle] links backed by the arm's arrays
+    '''
+    __slots__ = ('_arm',)
+
+    def __init__(self, arm):
+        self._arm = arm
+
+    def __getitem__(self, i):
+        n = len(self)
+        if isinstance(i, slice):
+            return [_Link(self._arm, j) for j in range(*i.indices(n))]
+        if i < 0:
+            i += n
+        if not 0 <= i < n:
+            raise IndexError('link index out of range')
+        return _Link(self._arm, i)
+
+    def __len__(self):
+        return len(self._arm.lengths)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield _Link(self._arm, i)
+
+    def __repr__(self):
+        return repr(list(map(list, self)))
 
 
 class Scara:
-    def __init__(self, linkages: tuple):
-        angles = [0] * len(linkages)  # in degrees
-        self.links = list((list(i) for i in zip(linkages, angles)))
+    '''
+    Stateful arm model: an immutable ArmGeometry plus the current joint angles.
+    The kinematics are delegated to the pure functions in kinematics.py.
+    '''
+    __slots__ = ('geometry', 'lengths', 'angles', '_lengths')
 
+    def __init__(self, linkages: tuple):
+        if not isinstance(linkages, kinematics.ArmGeometry):
+            linkages = kinematics.ArmGeometry(tuple(linkages))
+        self._set_geometry(linkages)
+        self.angles = np.zeros(len(self.lengths), dtype=np.float64)  # in degrees
+
+    def _set_geometry(self, geometry):
+        # contiguous arm state
+        self.geometry = geometry
+        self.lengths = geometry.lengths_array  # read only, replaced with the geometry
+        self._lengths = geometry.lengths
+
+    # derived constants, cached on the geometry
+    l1_sq = property(lambda self: self.geometry.l1_sq)
+    l2_sq = property(lambda self: self.geometry.l2_sq)
+    two_l1_l2 = property(lambda self: self.geometry.two_l1_l2)
+    min_reach = property(lambda self: self.geometry.min_reach)
+    max_reach = property(lambda self: self.geometry.max_reach)
+
+    @property
+    def links(self):
         # link[0] = linkage
         # link[1] = angle
+        return _LinkView(self)
 
     def __str__(self):
-        return '\n'.join(list(f'l{i+1}: {link[0]} | a{i+1}: {link[1]}' for i, link in enumerate(self.links)))
+        return '\n'.join(
+            f'l{i+1}: {length:g} | a{i+1}: {angle:g}'
+            for i, (length, angle) in enumerate(zip(self._lengths, self.angles.tolist()))
+        )
 
     def display(self, print=False):
         # print the linkages and angles if print=True
@@ -29,11 +130,11 @@ class Scara:
         # plot the linkages
         cum_pos = (0, 0)
         cum_angle = 0
-        for link in self.links:
-            cum_angle += link[1]
+        for length, angle in zip(self._lengths, self.angles.tolist()):
+            cum_angle += angle
             new_pos = (
-                cum_pos[0] + link[0] * math.cos(math.radians(cum_angle)),
-                cum_pos[1] + link[0] * math.sin(math.radians(cum_angle))
+                cum_pos[0] + length * math.cos(math.radians(cum_angle)),
+                cum_pos[1] + length * math.sin(math.radians(cum_angle))
             )
             ax.plot(
                 [cum_pos[0], new_pos[0]],
@@ -49,56 +150,26 @@ class Scara:
         # show the plot
         plt.show()
 
+    @metrics.timed('scara.inverse')
     def inverse(self, target: tuple) -> tuple:
         '''
         pos: tuple of position (x, y)
         returns: tuple of angles in degrees (a1, a2)
         '''
-        if len(self.links) != 2:
-            raise Exception('Inverse kinematics only works for 2 linkages')
-
-        # a_{2}=\arccos\left(\frac{x_{2}^{2}+y_{2}^{2}-l_{1}^{2}-l_{2}^{2}}{2l_{1}l_{2}}\right)
-        # a_{1}=\arctan\left(\frac{y_{2}}{x_{2}}\right)-\arctan\left(\frac{l_{2}\sin\left(a_{2}\right)}{l_{1}+l_{2}\cos\left(a_{2}\right)}\right)
-
-        x, y = target
-        l1 = self.links[0][0]
-        l2 = self.links[1][0]
-
-        try:
-            a2_rad = math.acos((x**2 + y**2 - l1**2 - l2**2) / (2 * l1 * l2))
-            a1_rad = (
-                math.atan(y / x) -
-                math.atan(l2 * math.sin(a2_rad) / (l1 + l2 * math.cos(a2_rad)))
-            )
-        except ValueError:
-            raise Exception('Position is out of reach')
-
-        if x < 0:
-            a1_rad += math.pi
-
-        return (math.degrees(a1_rad), math.degrees(a2_rad))
+        return kinematics.inverse_point(self.geometry, target)
 
+    @metrics.timed('scara.forward')
     def forward(self, angles: tuple) -> tuple:
         '''
         angles: tuple of angles in degrees
         returns: tuple of position
         '''
-        cum_pos = (0, 0)
-        cum_angle = 0
-
-        for i, link in enumerate(self.links):
-            cum_angle += angles[i]
-            cum_pos = (
-                cum_pos[0] + link[0] * math.cos(math.radians(cum_angle)),
-                cum_pos[1] + link[0] * math.sin(math.radians(cum_angle))
-            )
-        return cum_pos
+        return kinematics.forward_point(self.geometry, angles)
 
     def set_position(self, pos: tuple):
         self.set_angles(self.inverse(pos))
 
     def set_angles(self, angles: tuple):
-        if len(angles) != len(self.links):
+        if len(angles) != len(self._lengths):
             raise Exception('Number of angles must match number of linkages')
-        for i, angle in enumerate(angles):
-            self.links[i][1] = angle
\ No newline at end of file
+        self.angles[:] = angles
@@ -0,0 +1,91 @@
+'''
+Singularity proximity and speed scaling along trajectories.
+
+Near full extension (a2 = 0) or folded back over the base the arm Jacobian loses
+rank, so a steady end effector speed needs unbounded joint speeds. These helpers
+find where that happens and slow the trajectory down only there.
+'''
+from typing import NamedTuple
+
+import numpy as np
+
+import kinematics
+from trajectory import Trajectory
+
+
+class SpeedProfile(NamedTuple):
+    manipulability: np.ndarray  # normalized manipulability at each knot, 1 is the best possible
+    near_singular: np.ndarray  # knots closer to a singularity than the threshold
+    scale: np.ndarray  # speed scale of each segment between knots, 1 is full speed
+    joint_speeds: np.ndarray  # peak joint speed of each segment in degrees per second after scaling
+    duration: float  # the duration needed to keep the joint speeds bounded
+    trajectory: Trajectory  # the trajectory retimed with the speed scale
+
+
+def normalized_manipulability(geom, angles) -> np.ndarray:
+    '''
+    Returns the manipulability divided by its maximum over the workspace, in [0, 1]
+    '''
+    m = kinematics.manipulability(geom, angles)
+    if len(geom) == 2:
+        return m / (geom.lengths[0] * geom.lengths[1])
+    # each 2x2 minor of J is bounded by the product of the reach of its two joints, so by
+    # Cauchy-Binet this bounds the manipulability from above
+    reach = np.cumsum(geom.lengths_array[::-1])[::-1]
+    pairs = np.triu(np.outer(reach, reach), 1)
+    return m / np.sqrt(np.sum(pairs**2))
+
+
+def manipulability_map(geom, xs, ys) -> np.ndarray:
+    '''
+    Returns the normalized manipulability over a grid of positions, nan where out of reach
+
+    Parameters:
+        geom (ArmGeometry): the arm geometry
+        xs (array): the grid x positions
+        ys (array): the grid y positions
+
+    Returns:
+        np.ndarray: the manipulability with shape (len(ys), len(xs))
+    '''
+    x, y = np.meshgrid(xs, ys)
+    a1, a2 = kinematics.inverse(geom, x, y, strict=False)
+    return normalized_manipulability(geom, np.stack((a1, a2), axis=-1))
+
+
+def speed_profile(traj: Trajectory, duration: float, max_joint_speed: float, threshold: float = 0.1) -> SpeedProfile:
+    '''
+    Finds near singular segments of a trajectory and scales the speed of each segment
+    so no joint moves faster than max_joint_speed, leaving the other segments at full speed
+
+    Parameters:
+        traj (Trajectory): the trajectory, played over duration
+        duration (float): the nominal duration of the trajectory in seconds
+        max_joint_speed (float): the joint speed limit in degrees per second
+        threshold (float): the normalized manipulability below which a knot is near singular (default: 0.1)
+
+    Returns:
+        SpeedProfile: the analysis and the retimed trajectory
+    '''
+    geom = kinematics.ArmGeometry(traj.lengths)
+    angles = np.asarray(traj.angles)
+    m = normalized_manipulability(geom, angles)
+
+    # peak joint speed of each segment at the nominal timing
+    dts = np.diff(traj.ts) * duration
+    moves = np.abs(np.diff(angles, axis=0)).max(axis=-1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        speeds = np.where(dts > 0, moves / dts, np.where(moves > 0, np.inf, 0))
+        scale = np.minimum(1, max_joint_speed / speeds)
+
+    # stretch the slow segments, zero length segments stay zero length
+    new_dts = np.where(dts > 0, dts / scale, moves / max_joint_speed)
+    new_duration = float(new_dts.sum())
+    ts = np.concatenate(([0.0], np.cumsum(new_dts)))
+    ts = ts / new_duration if new_duration > 0 else np.asarray(traj.ts, dtype=np.float64)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        joint_speeds = np.where(new_dts > 0, moves / new_dts, 0)
+
+    retimed = Trajectory(ts, angles, traj.lengths, metadata=dict(traj.metadata, duration=new_duration))
+    return SpeedProfile(m, m < threshold, scale, joint_speeds, new_duration, retimed)
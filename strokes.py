@@ -0,0 +1,267 @@
+'''
+Stroke capture and planning for multi-stroke paths.
+
+Points are stored in preallocated arrays that grow geometrically, and each stroke
+keeps the time and distance throttling state of its own instead of module globals.
+Strokes are kept separate so the travel moves between them can be ordered to
+minimize joint space travel instead of drawing fake segments between them.
+'''
+import numpy as np
+
+import kinematics
+from trajectory import Trajectory
+
+
+class PointBuffer:
+    '''
+    Growable (n, 2) float64 array of points with amortized O(1) appends
+
+    Parameters:
+        capacity (int): the number of points to preallocate (default: 1024)
+    '''
+    __slots__ = ('_data', '_n')
+
+    def __init__(self, capacity: int = 1024):
+        self._data = np.empty((max(1, capacity), 2), dtype=np.float64)
+        self._n = 0
+
+    def append(self, x: float, y: float):
+        if self._n == len(self._data):
+            grown = np.empty((2 * len(self._data), 2), dtype=np.float64)
+            grown[:self._n] = self._data
+            self._data = grown
+        self._data[self._n] = x, y
+        self._n += 1
+
+    def last(self) -> tuple:
+        return tuple(self._data[self._n - 1])
+
+    def __len__(self):
+        return self._n
+
+    @property
+    def array(self) -> np.ndarray:
+        '''
+        A view of the points appended so far
+        '''
+        return self._data[:self._n]
+
+
+class StrokeRecorder:
+    '''
+    Records mouse strokes, throttling points by distance and time
+
+    Parameters:
+        min_dist (float): the minimum distance between recorded points (default: 0)
+        min_interval (float): the minimum time in seconds between recorded points (default: 0)
+    '''
+
+    def __init__(self, min_dist: float = 0, min_interval: float = 0):
+        self.min_dist = min_dist
+        self.min_interval = min_interval
+        self.strokes = []  # finished strokes as (n, 2) arrays
+        self.current = None
+        self._last_time = None
+        self._pending = None  # last throttled point, kept for the end of the stroke
+
+    def begin(self, x: float, y: float, time: float = 0):
+        '''
+        Starts a new stroke at (x, y), ending the current one if any
+        '''
+        self.end()
+        self.current = PointBuffer()
+        self.current.append(x, y)
+        self._last_time = time
+        self._pending = None
+
+    def add(self, x: float, y: float, time: float = 0) -> bool:
+        '''
+        Adds a point to the current stroke
+
+        Returns:
+            bool: whether the point was recorded rather than throttled
+        '''
+        if self.current is None:
+            self.begin(x, y, time)
+            return True
+
+        last_x, last_y = self.current.last()
+        if (
+            (x - last_x)**2 + (y - last_y)**2 < self.min_dist**2 or
+            time - self._last_time < self.min_interval
+        ):
+            self._pending = (x, y)
+            return False
+
+        self.current.append(x, y)
+        self._last_time = time
+        self._pending = None
+        return True
+
+    def end(self):
+        '''
+        Finishes the current stroke, keeping its last throttled point
+        '''
+        if self.current is None:
+            return
+        if self._pending is not None:
+            self.current.append(*self._pending)
+        self.strokes.append(self.current.array.copy())
+        self.current = None
+        self._pending = None
+
+    def points(self) -> np.ndarray:
+        '''
+        Returns all recorded points of every stroke in drawing order, shape (n, 2)
+        '''
+        strokes = list(self.strokes)
+        if self.current is not None:
+            strokes.append(self.current.array)
+        if not strokes:
+            return np.empty((0, 2))
+        return np.concatenate(strokes)
+
+
+def endpoint_angles(geom, strokes: list) -> np.ndarray:
+    '''
+    Solves the inverse kinematics of both ends of every stroke in one batch
+
+    Returns:
+        np.ndarray: angles in degrees with shape (2 * n_strokes, 2), row 2i is the start of stroke i and 2i + 1 its end
+    '''
+    ends = np.array([(stroke[0], stroke[-1]) for stroke in strokes], dtype=np.float64).reshape(-1, 2)
+    a1s, a2s = kinematics.inverse(geom, ends[:, 0], ends[:, 1])
+    return np.column_stack((a1s, a2s))
+
+
+def travel_matrix(angles: np.ndarray) -> np.ndarray:
+    '''
+    Returns the joint space travel between every pair of configurations, the largest joint move in degrees,
+    which is proportional to the move time when the joints move together at the same speed
+    '''
+    return np.abs(angles[:, None, :] - angles[None, :, :]).max(axis=-1)
+
+
+def _tour_cost(dist: np.ndarray, order: list, start: np.ndarray = None) -> float:
+    entries = [2*i + r for i, r in order]
+    exits = [2*i + 1 - r for i, r in order]
+    cost = float(dist[exits[:-1], entries[1:]].sum())
+    if start is not None:
+        cost += float(start[entries[0]])
+    return cost
+
+
+def order_strokes(geom, strokes: list, start_angles: tuple = None, max_passes: int = 50) -> tuple:
+    '''
+    Picks the order and direction of the strokes that minimizes joint space travel between them,
+    with a nearest neighbour tour improved by 2-opt
+
+    Parameters:
+        geom (ArmGeometry): the arm geometry
+        strokes (list): the strokes, each an (n, 2) array of positions
+        start_angles (tuple): the joint angles the arm starts at (default: None, start at any stroke)
+        max_passes (int): the maximum number of 2-opt passes (default: 50)
+
+    Returns:
+        tuple: (order, travel), order is a list of (stroke index, reversed) and travel the total travel in degrees
+    '''
+    m = len(strokes)
+    if m == 0:
+        return [], 0.0
+
+    angles = endpoint_angles(geom, strokes)
+    dist = travel_matrix(angles)
+    start = None
+    if start_angles is not None:
+        start = np.abs(angles - np.asarray(start_angles, dtype=np.float64)).max(axis=-1)
+
+    # nearest neighbour, entering each stroke from its closer end
+    visited = np.zeros(m, dtype=bool)
+    if start is None:
+        current = np.zeros(2 * m)
+        current[1::2] = np.inf  # begin at the start of the first stroke
+    else:
+        current = start
+    order = []
+    for _ in range(m):
+        candidates = np.where(np.repeat(visited, 2), np.inf, current)
+        endpoint = int(np.argmin(candidates))
+        i, r = divmod(endpoint, 2)
+        order.append((i, r))
+        visited[i] = True
+        current = dist[2*i + 1 - r]
+
+    # 2-opt, reversing order[i:k+1] flips each stroke in it and only changes the two boundary moves
+    for _ in range(max_passes):
+        improved = False
+        for i in range(m - 1):
+            entries = np.array([2*s + r for s, r in order])
+            exits = np.array([2*s + 1 - r for s, r in order])
+            ks = np.arange(i + 1, m)
+
+            if i > 0:
+                before = dist[exits[i-1], entries[i]]
+                after = dist[exits[i-1], exits[ks]]
+            elif start is not None:
+                before = start[entries[0]]
+                after = start[exits[ks]]
+            else:
+                before = 0.0
+                after = np.zeros(len(ks))
+
+            next_entries = entries[np.minimum(ks + 1, m - 1)]
+            has_next = ks + 1 < m
+            before = before + np.where(has_next, dist[exits[ks], next_entries], 0.0)
+            after = after + np.where(has_next, dist[entries[i], next_entries], 0.0)
+
+            gains = before - after
+            best = int(np.argmax(gains))
+            if gains[best] > 1e-9:
+                k = int(ks[best])
+                order[i:k+1] = [(s, 1 - r) for s, r in reversed(order[i:k+1])]
+                improved = True
+        if not improved:
+            break
+
+    return order, _tour_cost(dist, order, start)
+
+
+def strokes_trajectory(geom, strokes: list, order: list = None, start_angles: tuple = None) -> Trajectory:
+    '''
+    Solves the inverse kinematics of every stroke point in one batch and joins the strokes
+    with linear joint space travel moves
+
+    Parameters:
+        geom (ArmGeometry): the arm geometry
+        strokes (list): the strokes, each an (n, 2) array of positions
+        order (list): the (stroke index, reversed) order to use (default: None, optimized with order_strokes)
+        start_angles (tuple): the joint angles the arm starts at, used when optimizing the order (default: None)
+
+    Returns:
+        Trajectory: the trajectory, its knot times are spread by joint travel and
+        metadata['strokes'] holds the [first, last] knot of each stroke in order
+    '''
+    if order is None:
+        order, _ = order_strokes(geom, strokes, start_angles)
+    if not order:
+        raise Exception('No strokes to plan')
+
+    points = [strokes[i][::-1] if r else strokes[i] for i, r in order]
+    counts = [len(p) for p in points]
+    points = np.concatenate(points).astype(np.float64)
+    a1s, a2s = kinematics.inverse(geom, points[:, 0], points[:, 1])
+    angles = np.column_stack((a1s, a2s))
+
+    # time is proportional to the largest joint move between knots
+    steps = np.abs(np.diff(angles, axis=0)).max(axis=-1)
+    ts = np.concatenate(([0.0], np.cumsum(steps)))
+    if ts[-1] > 0:
+        ts /= ts[-1]
+    else:
+        ts = np.linspace(0, 1, len(ts))
+
+    bounds = np.cumsum([0] + counts)
+    spans = [[int(bounds[j]), int(bounds[j+1]) - 1] for j in range(len(counts))]
+    return Trajectory(ts, angles, geom.lengths, metadata={
+        'source': 'strokes', 'order': [[int(i), int(r)] for i, r in order], 'strokes': spans
+    })
@@ -0,0 +1,124 @@
+'''
+Equivalence of the accel kernels with the numpy and pure Python kinematics, on every available backend.
+'''
+import numpy as np
+import pytest
+
+import accel
+import kinematics
+import metrics
+import trajectory
+
+GEOM = kinematics.ArmGeometry((50.0, 40.0))
+BACKENDS = ['python'] + (['numba'] if accel.numba is not None else [])
+
+# targets on the axes, including -0.0, near the reach limits, and out of reach
+EDGE_TARGETS = [
+    (0.0, 50.0), (0.0, -50.0), (-0.0, 50.0), (-0.0, -50.0), (50.0, 0.0), (-50.0, 0.0),
+    (-50.0, -0.0), (90.0, 0.0), (0.0, 10.0), (-60.0, -30.0), (30.0, -60.0),
+]
+UNREACHABLE = [(0.0, 0.0), (0.0, 95.0), (91.0, 0.0), (-5.0, 5.0), (200.0, -200.0)]
+
+
+@pytest.fixture(params=BACKENDS)
+def backend(request):
+    previous = accel.backend
+    accel.set_backend(request.param)
+    yield request.param
+    accel.set_backend(previous)
+
+
+def _python_inverse_point(target):
+    # kinematics.inverse_point without dispatch to the kernels
+    previous = accel.backend
+    accel.set_backend('python')
+    try:
+        return kinematics.inverse_point(GEOM, target)
+    finally:
+        accel.set_backend(previous)
+
+
+@pytest.mark.parametrize('target', EDGE_TARGETS)
+def test_inverse_point_matches_python(backend, target):
+    expected = _python_inverse_point(target)
+    got = accel.inverse_point(GEOM, target)
+    assert got == pytest.approx(expected, abs=1e-9)
+    assert kinematics.inverse_point(GEOM, target) == pytest.approx(expected, abs=1e-9)
+
+
+@pytest.mark.parametrize('target', EDGE_TARGETS)
+def test_inverse_point_matches_vectorized(target):
+    a1, a2 = kinematics.inverse(GEOM, np.array([target[0]]), np.array([target[1]]))
+    expected = _python_inverse_point(target)
+    assert (a1[0], a2[0]) == pytest.approx(expected, abs=1e-9)
+
+
+@pytest.mark.parametrize('target', UNREACHABLE)
+def test_unreachable_raises_and_counts(backend, target):
+    metrics.enable()
+    metrics.reset()
+    try:
+        with pytest.raises(Exception, match='out of reach'):
+            kinematics.inverse_point(GEOM, target)
+        assert metrics.snapshot()['counters']['kinematics.unreachable'] == 1
+    finally:
+        metrics.disable()
+        metrics.reset()
+
+
+@pytest.mark.parametrize('target', [(0.0, 0.0), (0.0, -0.0), (-0.0, 0.0), (-0.0, -0.0)])
+def test_base_of_equal_links(backend, target):
+    # the origin is reachable with a folded arm, where the elbow term has a zero denominator
+    geom = kinematics.ArmGeometry((50.0, 50.0))
+    expected = kinematics.inverse_point(geom, target)
+    a1, a2 = kinematics.inverse(geom, np.array([target[0]]), np.array([target[1]]))
+    assert (a1[0], a2[0]) == pytest.approx(expected, abs=1e-9)
+    assert accel.inverse_point(geom, target) == pytest.approx(expected, abs=1e-9)
+    np.testing.assert_allclose(
+        np.stack(accel.inverse_array(geom, np.array([target[0]]), np.array([target[1]])), axis=-1)[0],
+        expected, atol=1e-9
+    )
+
+
+def test_inverse_array_matches_vectorized(backend):
+    rng = np.random.default_rng(1)
+    x = np.concatenate((rng.uniform(-95, 95, 2000), [t[0] for t in EDGE_TARGETS + UNREACHABLE[1:]]))
+    y = np.concatenate((rng.uniform(-95, 95, 2000), [t[1] for t in EDGE_TARGETS + UNREACHABLE[1:]]))
+
+    expected = np.stack(kinematics.inverse(GEOM, x, y, strict=False), axis=-1)
+    got = np.stack(accel.inverse_array(GEOM, x, y), axis=-1)
+    np.testing.assert_array_equal(np.isnan(got), np.isnan(expected))
+    np.testing.assert_allclose(got, expected, atol=1e-9)
+
+
+def test_forward_point_matches_vectorized(backend):
+    rng = np.random.default_rng(2)
+    angles = rng.uniform(-360, 360, (200, 2))
+    fx, fy = kinematics.forward(GEOM, angles)
+    for i in range(len(angles)):
+        assert accel.forward_point(GEOM, angles[i]) == pytest.approx((fx[i], fy[i]), abs=1e-9)
+
+
+@pytest.mark.parametrize('t', [-1.0, -1e-12, 0.0, 0.3, 0.5, 1.0, 1 + 1e-12, 2.0])
+def test_interp_matches_numpy(backend, t):
+    ts = np.array([0.0, 0.1, 0.1, 0.4, 1.0])
+    values = np.array([3.0, -1.0, 2.0, 5.0, 4.0])
+    assert accel.interp(ts, values, t) == pytest.approx(np.interp(t, ts, values), abs=1e-12)
+
+
+def test_trajectory_lookup_on_memmap(backend, tmp_path):
+    ts = np.linspace(0, 1, 50)
+    angles = np.column_stack((np.sin(ts * 5) * 90, np.cos(ts * 3) * 45))
+    path = str(tmp_path / 'knots.ikt')
+    trajectory.save(path, trajectory.Trajectory(ts, angles, GEOM.lengths))
+    loaded = trajectory.load(path)
+
+    a1, a2 = loaded.functions()
+    for t in (-0.5, 0.0, 0.37, 1.0, 1.5):
+        assert a1(t) == pytest.approx(np.interp(t, ts, angles[:, 0]), abs=1e-12)
+        assert a2(t) == pytest.approx(np.interp(t, ts, angles[:, 1]), abs=1e-12)
+        np.testing.assert_allclose(loaded.at(t), [a1(t), a2(t)], atol=1e-12)
+
+
+def test_verify(backend):
+    assert accel.verify() <= 1e-9
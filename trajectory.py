@@ -0,0 +1,281 @@
+'''
+Joint space trajectories and their on-disk format.
+
+A trajectory file is a versioned header followed by one raw little endian float64
+block with a row (t, a1, ..., an) per knot:
+
+    magic (6 bytes) | version (uint16) | header length (uint32) | JSON header | padding | rows
+
+The JSON header holds the link lengths and metadata. The number of rows is implied
+by the file size, so knots can be streamed onto the end of a file without rewriting
+the header, and loading memory-maps the block instead of reading it.
+'''
+import json
+import os
+import struct
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+import accel
+import kinematics
+import metrics
+import paths
+
+MAGIC = b'IKTRAJ'
+VERSION = 1
+_PREFIX = struct.Struct('<6sHI')
+_ALIGN = 64
+_DTYPE = np.dtype('<f8')
+
+
+class Trajectory:
+    '''
+    Knot times and joint angles of a trajectory, interpolated linearly in between
+
+    Parameters:
+        ts (array): increasing knot times in [0, 1], shape (n,)
+        angles (array): joint angles in degrees at each knot, shape (n, n_links)
+        lengths (tuple): the link lengths of the arm
+        metadata (dict): free form JSON serializable metadata (default: {})
+    '''
+    __slots__ = ('ts', 'angles', 'lengths', 'metadata')
+
+    def __init__(self, ts, angles, lengths, metadata: dict = None):
+        self.ts = np.asarray(ts, dtype=np.float64)
+        self.angles = np.asarray(angles, dtype=np.float64)
+        self.lengths = tuple(float(length) for length in lengths)
+        self.metadata = metadata or {}
+
+        if self.angles.ndim != 2 or self.angles.shape != (len(self.ts), len(self.lengths)):
+            raise Exception('Angles must have one row per knot and one column per linkage')
+
+    def __len__(self):
+        return len(self.ts)
+
+    def at(self, t) -> np.ndarray:
+        '''
+        Returns the joint angles at t, shape (..., n_links) for t of shape (...)
+        '''
+        if accel.compiled() and np.ndim(t) == 0:
+            return np.array([accel.interp(self.ts, self.angles[:, j], t) for j in range(self.angles.shape[1])])
+        return np.stack(
+            [np.interp(t, self.ts, self.angles[:, j]) for j in range(self.angles.shape[1])],
+            axis=-1
+        )
+
+    def joint(self, j: int):
+        '''
+        Returns a function of t for the angle of joint j, as used by simulate and animate
+        '''
+        ts = self.ts
+        column = self.angles[:, j]  # a view, so memory mapped knots are not read into memory
+
+        def a(t):
+            if accel.compiled() and np.ndim(t) == 0:
+                return accel.interp(ts, column, t)
+            return np.interp(t, ts, column)
+
+        return a
+
+    def functions(self) -> tuple:
+        '''
+        Returns a tuple of functions of t, one per joint
+        '''
+        return tuple(self.joint(j) for j in range(self.angles.shape[1]))
+
+
+class LazyTrajectory:
+    '''
+    Trajectory that solves the inverse kinematics of the path exactly wherever it is sampled,
+    instead of interpolating between precomputed knots
+
+    Parameters:
+        geom (ArmGeometry): the arm geometry
+        path (function): a parametric function of t in [0, 1] returning the target position
+        memo (int): the number of recent scalar evaluations to remember (default: 256, 0 disables)
+        metadata (dict): free form JSON serializable metadata (default: {})
+    '''
+
+    def __init__(self, geom, path, memo: int = 256, metadata: dict = None):
+        self.geom = geom
+        self.path = path
+        self.lengths = geom.lengths
+        self.metadata = metadata or {}
+        self.memo = memo
+        self._memo = OrderedDict()
+        self._lock = threading.Lock()
+
+    def at(self, t) -> np.ndarray:
+        '''
+        Returns the joint angles at t, shape (..., n_links) for t of shape (...)
+        '''
+        if np.ndim(t) == 0 and self.memo:
+            key = float(t)
+            with self._lock:
+                angles = self._memo.get(key)
+                if angles is not None:
+                    self._memo.move_to_end(key)
+                    metrics.count('trajectory.lazy.memo_hits')
+                    return angles
+
+        ts = np.asarray(t, dtype=np.float64)
+        x, y = paths.sample_path(self.path, ts)
+        angles = np.stack(kinematics.inverse(self.geom, x, y), axis=-1)
+        metrics.count('trajectory.lazy.solved', ts.size)
+
+        if ts.ndim == 0 and self.memo:
+            angles.flags.writeable = False
+            with self._lock:
+                self._memo[key] = angles
+                if len(self._memo) > self.memo:
+                    self._memo.popitem(last=False)
+        return angles
+
+    def joint(self, j: int):
+        '''
+        Returns a function of t for the angle of joint j, as used by simulate and animate
+        '''
+        def a(t):
+            return self.at(t)[..., j]
+
+        return a
+
+    def functions(self) -> tuple:
+        '''
+        Returns a tuple of functions of t, one per joint
+        '''
+        return tuple(self.joint(j) for j in range(len(self.lengths)))
+
+    def sample(self, intervals: int) -> Trajectory:
+        '''
+        Returns a knot based Trajectory solved at intervals + 1 evenly spaced times, e.g. for saving
+        '''
+        ts = np.linspace(0, 1, intervals + 1)
+        return Trajectory(ts, self.at(ts), self.lengths, metadata=dict(self.metadata))
+
+
+def _header(lengths: tuple, metadata: dict) -> bytes:
+    header = json.dumps({
+        'lengths': list(lengths),
+        'metadata': metadata,
+        'columns': ['t'] + [f'a{j+1}' for j in range(len(lengths))],
+    }).encode()
+    size = _PREFIX.size + len(header)
+    header += b' ' * (-size % _ALIGN)  # align the float block
+    return _PREFIX.pack(MAGIC, VERSION, len(header)) + header
+
+
+def _read_header(f) -> tuple:
+    prefix = f.read(_PREFIX.size)
+    if len(prefix) < _PREFIX.size:
+        raise Exception('Not a trajectory file')
+    magic, version, size = _PREFIX.unpack(prefix)
+    if magic != MAGIC:
+        raise Exception('Not a trajectory file')
+    if version != VERSION:
+        raise Exception(f'Unsupported trajectory file version {version}')
+    header = json.loads(f.read(size))
+    return header, _PREFIX.size + size
+
+
+def _rows(ts, angles) -> np.ndarray:
+    ts = np.asarray(ts, dtype=_DTYPE).reshape(-1, 1)
+    angles = np.asarray(angles, dtype=_DTYPE).reshape(len(ts), -1)
+    return np.hstack((ts, angles))
+
+
+def save(path: str, traj: Trajectory):
+    '''
+    Writes a trajectory to a file, replacing it atomically
+    '''
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(_header(traj.lengths, traj.metadata))
+        f.write(_rows(traj.ts, traj.angles).tobytes())
+    os.replace(tmp, path)
+
+
+def load(path: str, mmap: bool = True) -> Trajectory:
+    '''
+    Loads a trajectory file
+
+    Parameters:
+        path (str): the file to load
+        mmap (bool): memory-map the knots read only instead of reading them (default: True)
+
+    Returns:
+        Trajectory: the trajectory, its ts and angles are views of the file when mmap is True
+    '''
+    with open(path, 'rb') as f:
+        header, offset = _read_header(f)
+        n_cols = len(header['lengths']) + 1
+        # ignore a partially written trailing row
+        n_rows = (os.fstat(f.fileno()).st_size - offset) // (n_cols * _DTYPE.itemsize)
+
+        if n_rows == 0:
+            block = np.empty((0, n_cols), dtype=_DTYPE)
+        elif mmap:
+            block = np.memmap(f, dtype=_DTYPE, mode='r', offset=offset, shape=(n_rows, n_cols))
+        else:
+            f.seek(offset)
+            block = np.fromfile(f, dtype=_DTYPE, count=n_rows * n_cols).reshape(n_rows, n_cols)
+
+    traj = Trajectory.__new__(Trajectory)
+    traj.ts = block[:, 0]
+    traj.angles = block[:, 1:]
+    traj.lengths = tuple(header['lengths'])
+    traj.metadata = header['metadata']
+    return traj
+
+
+class TrajectoryWriter:
+    '''
+    Streams knots onto the end of a trajectory file, creating it if needed
+
+    Parameters:
+        path (str): the file to write
+        lengths (tuple): the link lengths of the arm, must match an existing file
+        metadata (dict): metadata for a new file (default: {})
+    '''
+
+    def __init__(self, path: str, lengths: tuple, metadata: dict = None):
+        self.lengths = tuple(float(length) for length in lengths)
+
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            with open(path, 'rb') as f:
+                header, offset = _read_header(f)
+            if tuple(header['lengths']) != self.lengths:
+                raise Exception('Link lengths do not match the existing trajectory file')
+
+            # drop a partially written trailing row before appending
+            row_size = (len(self.lengths) + 1) * _DTYPE.itemsize
+            size = os.path.getsize(path)
+            self._file = open(path, 'r+b')
+            self._file.truncate(size - (size - offset) % row_size)
+            self._file.seek(0, os.SEEK_END)
+        else:
+            self._file = open(path, 'wb')
+            self._file.write(_header(self.lengths, metadata or {}))
+
+    def append(self, ts, angles):
+        '''
+        Appends knots, ts of shape (n,) and angles of shape (n, n_links)
+        '''
+        rows = _rows(ts, angles)
+        if rows.shape[1] != len(self.lengths) + 1:
+            raise Exception('Number of angles must match number of linkages')
+        self._file.write(rows.tobytes())
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()